@@ -1,15 +1,22 @@
 import gradio as gr
 import librosa, numpy as np
-import matplotlib.pyplot as plt
-import tempfile, os, shutil, traceback, re, hashlib, json
+import scipy.fft, scipy.signal
+from matplotlib.figure import Figure
+import tempfile, os, traceback, re, hashlib, json, time, threading
+import multiprocessing, sqlite3, subprocess, glob, asyncio, math, heapq, itertools, gc
+from array import array
 import yt_dlp
+import uvicorn
 import whisper
 import torch
-import soundfile as sf
 from functools import lru_cache
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
 from langdetect import detect
 from langdetect.lang_detect_exception import LangDetectException
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
 
 # ======================================================
 # SETTINGS (BANDS / COLORS / HUMAN EXPLANATIONS)
@@ -586,19 +593,146 @@ EXPLICIT_WORDS = set([
 
 ])
 # ======================================================
-# MODEL CACHING (stable)
+# MODEL REGISTRY (per process, memory-bounded)
+# each model is charged its parameter/buffer bytes plus a fixed load overhead (not the
+# RSS change while it loads, which analysis threads allocating at the same time would
+# inflate); past MODEL_MEMORY_BUDGET_MB the least-recently-used models are dropped
 # ======================================================
 
-@lru_cache(maxsize=2)
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))  # 0 = unbounded
+# per model: tokenizer, vocab, Python-side structures beyond the tensors
+MODEL_LOAD_OVERHEAD_MB = float(os.getenv("MODEL_LOAD_OVERHEAD_MB", "64"))
+# loaded at startup, e.g. "whisper:base,whisper:tiny,sentiment"; with LYRICS_START_METHOD=fork
+# the lyrics workers are forked afterwards and share these weights copy-on-write
+PRELOAD_MODELS = [m.strip() for m in os.getenv("PRELOAD_MODELS", "").split(",") if m.strip()]
+
+def process_rss():
+    # resident set size in bytes (Linux /proc); 0 where unavailable
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def model_weight_bytes(obj):
+    parts = obj if isinstance(obj, tuple) else (obj,)
+    return sum(
+        t.numel() * t.element_size()
+        for m in parts if hasattr(m, "parameters") and hasattr(m, "buffers")
+        for t in itertools.chain(m.parameters(), m.buffers())
+    )
+
+class ModelRegistry:
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # name -> entry, least recently used first
+        self._sizes = {}              # name -> bytes at its last load, to make room before reloading
+        self._load_lock = threading.Lock()  # one load at a time: eviction decisions see settled sizes
+
+    def get(self, name, loader):
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._models.move_to_end(name)
+                entry["hits"] += 1
+                entry["used"] = time.monotonic()
+                return entry["model"]
+        with self._load_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    return entry["model"]
+                self._evict(self._sizes.get(name, 0))
+            t0 = time.perf_counter()
+            model = loader()
+            weights = model_weight_bytes(model)
+            size = weights + int(MODEL_LOAD_OVERHEAD_MB * 2**20)
+            with self._lock:
+                self._models[name] = {
+                    "model": model, "bytes": size, "weights": weights, "hits": 0,
+                    "used": time.monotonic(), "load_s": time.perf_counter() - t0,
+                }
+                self._sizes[name] = size
+                self._evict(0, keep=name)
+                self._publish()
+            metric_inc("model_loads")
+            return model
+
+    def _evict(self, incoming, keep=None):
+        # caller holds self._lock
+        if not self.budget:
+            return
+        evicted = False
+        while self._models and sum(e["bytes"] for e in self._models.values()) + incoming > self.budget:
+            name = next((n for n in self._models if n != keep), None)
+            if name is None:
+                break  # a single model over budget still has to run
+            del self._models[name]
+            metric_inc("model_evictions")
+            evicted = True
+        if evicted:
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            self._publish()
+
+    def _publish(self):
+        metric_set("model_memory_mb", round(sum(e["bytes"] for e in self._models.values()) / 2**20, 1))
+
+    def report(self):
+        now = time.monotonic()
+        with self._lock:
+            models = [
+                {
+                    "name": name, "mb": round(e["bytes"] / 2**20, 1), "weights_mb": round(e["weights"] / 2**20, 1),
+                    "hits": e["hits"], "idle_s": round(now - e["used"], 1), "load_s": round(e["load_s"], 2),
+                }
+                for name, e in reversed(self._models.items())
+            ]
+        return {
+            "pid": os.getpid(),
+            "budget_mb": MODEL_MEMORY_BUDGET_MB or None,
+            "resident_mb": round(sum(m["mb"] for m in models), 1),
+            "process_rss_mb": round(process_rss() / 2**20, 1),
+            "models": models,
+        }
+
+MODELS = ModelRegistry(int(MODEL_MEMORY_BUDGET_MB * 2**20))
+
 def get_whisper(size="base"):
-    return whisper.load_model(size)
+    return MODELS.get(f"whisper:{size}", lambda: whisper.load_model(size))
 
-@lru_cache(maxsize=1)
-def get_sentiment():
+# openai-whisper is not safe to call from two threads on one model: each transcribe
+# installs kv-cache hooks on the shared decoder modules, so overlapping decodes read
+# each other's cached keys/values. Analysis threads take turns per model size
+_WHISPER_LOCKS = {}
+
+def whisper_transcribe(size, seg):
+    with _WHISPER_LOCKS.setdefault(size, threading.Lock()):
+        return get_whisper(size).transcribe(seg, fp16=torch.cuda.is_available())
+
+def _load_sentiment():
     tok = AutoTokenizer.from_pretrained("cardiffnlp/twitter-roberta-base-sentiment")
     mdl = AutoModelForSequenceClassification.from_pretrained("cardiffnlp/twitter-roberta-base-sentiment")
+    mdl.eval()
     return tok, mdl
 
+def get_sentiment():
+    return MODELS.get("sentiment", _load_sentiment)
+
+def preload_models():
+    for name in PRELOAD_MODELS:
+        kind, _, arg = name.partition(":")
+        if kind == "whisper":
+            get_whisper(arg or "base")
+        elif kind == "sentiment":
+            get_sentiment()
+        else:
+            raise ValueError(f"Unknown model in PRELOAD_MODELS: {name}")
+    if LYRICS_START_METHOD == "fork":
+        start_lyrics_pool()
+
 def roberta_sentiment(text: str):
     tok, mdl = get_sentiment()
     t = (text or "")[:1200]
@@ -618,66 +752,458 @@ def token_counts(text: str, vocab: set[str]) -> int:
     toks = re.findall(r"[a-zA-Z']+", text.lower())
     return sum(1 for t in toks if t in vocab)
 
+# FAST mode excerpt: one window at the centre of each of FAST_WINDOWS equal sections
+FAST_WINDOWS = 6
+FAST_WINDOW_S = 10.0
+
+def fast_excerpt_bounds(n, sr):
+    # (start, stop) sample ranges of the FAST excerpt for an n-sample track; one range when short.
+    # Same 60 s budget as the old start/mid/end triple, but intro and outro
+    # no longer weigh a third each, and short tracks are not double-counted
+    win = int(FAST_WINDOW_S * sr)
+    if n <= FAST_WINDOWS * win:
+        return [(0, n)]
+    centres = (np.arange(FAST_WINDOWS) + 0.5) * n / FAST_WINDOWS
+    return [(int(c) - win // 2, int(c) - win // 2 + win) for c in centres]
+
 def sample_audio_for_fft(y, sr):
-    win = int(20 * sr)
-    if len(y) <= win:
+    bounds = fast_excerpt_bounds(len(y), sr)
+    if len(bounds) == 1:
         return y
-    return np.concatenate([y[:win], y[len(y)//2:len(y)//2+win], y[-win:]])
+    return np.concatenate([y[a:b] for a, b in bounds])
 
 def pretty_duration(seconds: float) -> str:
     m = int(seconds // 60)
     s = int(seconds % 60)
     return f"{m}m {s:02d}s"
 
-def audio_fingerprint(y, sr):
-    # stable small fingerprint (for caching) from start/mid/end
-    y = np.asarray(y, dtype=np.float32)
-    n = len(y)
-    if n == 0:
-        return "empty"
-    take = min(n, sr*10)
-    a = y[:take]
-    b = y[n//2:n//2+take] if n//2+take <= n else y[n//2:]
-    c = y[-take:]
-    blob = np.concatenate([a, b, c])
-    h = hashlib.sha1(blob.tobytes() + str(sr).encode()).hexdigest()
-    return h
+# ======================================================
+# METRICS (process-local counters, shown in the UI)
+# ======================================================
+
+METRICS = {}
+_METRICS_LOCK = threading.Lock()
+
+def metric_inc(name, n=1):
+    with _METRICS_LOCK:
+        METRICS[name] = METRICS.get(name, 0) + n
+
+# latency samples (last 1024 per series), reported as p50/p95
+_SAMPLES = {}
+
+def metric_set(name, value):
+    with _METRICS_LOCK:
+        METRICS[name] = value
+
+def metric_observe(name, seconds):
+    with _METRICS_LOCK:
+        _SAMPLES.setdefault(name, deque(maxlen=1024)).append(seconds)
+
+def metrics_snapshot():
+    with _METRICS_LOCK:
+        snap = dict(METRICS)
+        samples = {k: np.array(v) for k, v in _SAMPLES.items() if v}
+    for k, v in samples.items():
+        snap[f"{k}_p50"] = round(float(np.percentile(v, 50)), 3)
+        snap[f"{k}_p95"] = round(float(np.percentile(v, 95)), 3)
+    hits = snap.get("transcript_cache_hits", 0)
+    misses = snap.get("transcript_cache_misses", 0)
+    snap["transcript_cache_hit_rate"] = round(hits / (hits + misses), 4) if (hits + misses) else 0.0
+    snap["models"] = MODELS.report()
+    return snap
+
+# ======================================================
+# REQUEST DEADLINE / CANCELLATION (cooperative)
+# stages call checkpoint() between units of work; a lapsed deadline degrades
+# the result (DSP-only verdict), a cancelled request just stops
+# ======================================================
+
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "300"))
+
+class RequestCancelled(Exception):
+    pass
+
+class DeadlineExceeded(Exception):
+    pass
+
+class RequestContext:
+    def __init__(self, deadline_s=REQUEST_DEADLINE_S):
+        self.deadline = time.monotonic() + deadline_s if deadline_s else None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def check(self, stage, deadline=True):
+        if self.cancelled:
+            raise RequestCancelled(stage)
+        if deadline and self.expired:
+            raise DeadlineExceeded(stage)
+
+def checkpoint(ctx, stage, deadline=True):
+    if ctx is not None:
+        ctx.check(stage, deadline=deadline)
+
+# ======================================================
+# TRANSCRIPT CACHE (per 16 kHz segment; survives restarts)
+# remixes / edits / re-uploads share segments even when the whole track differs
+# ======================================================
+
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "frequency_insight"))
+
+def whisper_backend():
+    # part of the cache key: different backends/precisions can transcribe differently
+    return f"openai-whisper:{'cuda-fp16' if torch.cuda.is_available() else 'cpu-fp32'}"
+
+class TranscriptCache:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(seg16, model_size):
+        h = hashlib.sha1(np.ascontiguousarray(seg16, dtype=np.float32).tobytes()).hexdigest()
+        return f"{h}::{model_size}::{whisper_backend()}"
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT text FROM transcripts WHERE key = ?", (key,)).fetchone()
+        metric_inc("transcript_cache_hits" if row else "transcript_cache_misses")
+        return row[0] if row else None
+
+    def put(self, key, text):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcripts (key, text, created) VALUES (?, ?, ?)",
+                (key, text, time.time()),
+            )
+            self._db.commit()
+
+@lru_cache(maxsize=1)
+def get_transcript_cache():
+    return TranscriptCache(os.path.join(CACHE_DIR, "transcripts.sqlite3"))
+
+# ======================================================
+# PERCEPTUAL FINGERPRINT (near-duplicate cache hits)
+# 64 bits from log-mel band/time differences over an 8 kHz signal:
+# volume changes cancel out, re-encodes/resamples/other formats flip few bits
+# ======================================================
+
+FP_SR = 8000
+FP_GRID = 9          # 9 time slices x 9 mel bands -> 8 x 8 = 64 difference bits
+FP_MAX_HAMMING = 3   # 4 x 16-bit tables: any match within 3 bits shares one table exactly
+FP_MAX_DURATION_DIFF = 2.0
+
+def perceptual_fingerprint(y, sr):
+    y8 = resample_poly_f32(y, sr, FP_SR)
+    # leading/trailing padding differs per upload (encoder delay, silence); trimmed at 8 ms
+    # resolution so the time slices start at the same sample within a few ms
+    y8, _ = librosa.effects.trim(y8, top_db=40, frame_length=256, hop_length=64)
+    if len(y8) < FP_SR:
+        return None
+    S = librosa.feature.melspectrogram(
+        y=y8, sr=FP_SR, n_fft=1024, hop_length=128, n_mels=FP_GRID, fmin=100, fmax=3800
+    )
+    if S.shape[1] < FP_GRID:
+        return None
+    # log of the slice mean (not mean of logs): loud frames dominate, so noise in quiet gaps can't flip bits
+    grid = np.log(np.stack([sl.mean(axis=1) for sl in np.array_split(S, FP_GRID, axis=1)]) + 1e-10)
+    bits = np.diff(np.diff(grid, axis=1), axis=0) > 0
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def popcount64(a):
+    return _POPCOUNT8[a.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+class FingerprintIndex:
+    # multi-index hashing: each 64-bit print is filed under its four 16-bit parts,
+    # so a lookup is 4 dict probes + one vectorised popcount per bucket. Buckets keep
+    # prints and durations in flat arrays: similar-sounding tracks share parts, and a
+    # crowded bucket must not become a Python loop (bench.py fingerprint)
+    PARTS = 4
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._tables = [{} for _ in range(self.PARTS)]
+        self._entries = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "key TEXT PRIMARY KEY, fp TEXT NOT NULL, duration REAL NOT NULL)"
+        )
+        self._db.commit()
+        for key, fp, duration in self._db.execute("SELECT key, fp, duration FROM fingerprints"):
+            self._insert(key, int(fp, 16), duration)
+
+    @classmethod
+    def _parts(cls, fp):
+        return [(fp >> (16 * i)) & 0xFFFF for i in range(cls.PARTS)]
+
+    def _insert(self, key, fp, duration):
+        self._entries[key] = (fp, duration)
+        for table, part in zip(self._tables, self._parts(fp)):
+            keys, fps, durations = table.setdefault(part, ([], array("Q"), array("d")))
+            keys.append(key)
+            fps.append(fp)
+            durations.append(duration)
+
+    def _lookup(self, fp, duration):
+        best, best_d = None, FP_MAX_HAMMING + 1
+        for table, part in zip(self._tables, self._parts(fp)):
+            bucket = table.get(part)
+            if bucket is None:
+                continue
+            keys, fps, durations = bucket
+            d = popcount64(np.frombuffer(fps, dtype=np.uint64) ^ np.uint64(fp))
+            d[np.abs(np.frombuffer(durations) - duration) > FP_MAX_DURATION_DIFF] = 64
+            i = int(np.argmin(d))
+            if d[i] < best_d:
+                best, best_d = keys[i], int(d[i])
+        return best
+
+    def lookup(self, fp, duration):
+        with self._lock:
+            return self._lookup(fp, duration)
+
+    def lookup_or_add(self, fp, duration):
+        # returns (canonical key, matched existing entry?)
+        with self._lock:
+            key = self._lookup(fp, duration)
+            if key is not None:
+                return key, True
+            key = f"pfp:{fp:016x}:{int(duration)}"
+            self._insert(key, fp, duration)
+            self._db.execute(
+                "INSERT OR REPLACE INTO fingerprints (key, fp, duration) VALUES (?, ?, ?)",
+                (key, f"{fp:016x}", float(duration)),
+            )
+            self._db.commit()
+            return key, False
+
+    def __len__(self):
+        return len(self._entries)
+
+@lru_cache(maxsize=1)
+def get_fingerprint_index():
+    return FingerprintIndex(os.path.join(CACHE_DIR, "fingerprints.sqlite3"))
+
+def exact_audio_key(y16):
+    # digest of the whole signal: any edit (a muted word) changes it, unlike the perceptual print
+    return f"pcm:{hashlib.sha1(np.ascontiguousarray(y16, dtype=np.float32)).hexdigest()}"
+
+def canonical_audio_key(y, sr):
+    fp = perceptual_fingerprint(y, sr)
+    if fp is None:
+        # too short/silent for a perceptual print: exact match only
+        return exact_audio_key(y)
+    key, matched = get_fingerprint_index().lookup_or_add(fp, len(y) / sr)
+    metric_inc("fingerprint_matches" if matched else "fingerprint_new")
+    return key
+
+# ======================================================
+# FLOAT32 DSP PRIMITIVES (float32 in -> complex64 / float32 out)
+# np.fft upcasts to complex128 on numpy<2; scipy.fft keeps the dtype and threads
+# ======================================================
+
+FFT_WORKERS = int(os.getenv("FFT_WORKERS", "0")) or (os.cpu_count() or 1)
+
+def as_float32(y):
+    return y if y.dtype == np.float32 else y.astype(np.float32)
+
+def magnitude_spectrum(y):
+    return np.abs(scipy.fft.rfft(as_float32(y), workers=FFT_WORKERS))
+
+def stft_magnitude(y, n_fft=2048, hop_length=512, center=True):
+    # librosa.stft goes through scipy.fft, so set_workers applies to its frame blocks
+    with scipy.fft.set_workers(FFT_WORKERS):
+        D = librosa.stft(as_float32(y), n_fft=n_fft, hop_length=hop_length, center=center, dtype=np.complex64)
+    return np.abs(D)
+
+def spectral_features(S, sr, n_fft, roll_percent=0.85, amin=1e-10):
+    # centroid / rolloff / flatness per frame, as librosa.feature.spectral_* compute them,
+    # from one magnitude S with bins on axis -2 (any leading batch axes), without
+    # librosa's normalised copy of S or its nan-masked rolloff search
+    freqs = np.fft.rfftfreq(n_fft, 1 / sr).astype(np.float32)
+    total = S.sum(axis=-2)
+    centroid = np.matmul(freqs, S) / np.where(total > np.finfo(S.dtype).tiny, total, 1)
+    cum = np.cumsum(S, axis=-2)
+    rolloff = freqs[np.argmax(cum >= roll_percent * cum[..., -1:, :], axis=-2)]
+    del cum
+    P = np.maximum(S * S, amin)
+    amean = P.mean(axis=-2)
+    flatness = np.exp(np.log(P, out=P).mean(axis=-2)) / amean
+    return centroid, rolloff, flatness
+
+def frame_zcr_rms(y, frame_length=2048, hop_length=512):
+    # librosa.feature.zero_crossing_rate / rms (center=True) per frame, from running
+    # sums over the samples instead of a framed copy; any leading batch axes.
+    # frame_length must be a multiple of hop_length
+    half = frame_length // 2
+    pad = [(0, 0)] * (y.ndim - 1) + [(half, half)]
+    n_frames = 1 + (y.shape[-1] + 2 * half - frame_length) // hop_length
+    starts = np.arange(n_frames) * hop_length
+
+    # a crossing is a sign flip between neighbours; |x| <= 1e-10 counts as positive
+    neg = np.pad(y, pad, mode="edge") < -1e-10
+    flips = np.cumsum(neg[..., 1:] != neg[..., :-1], axis=-1, dtype=np.int32)
+    flips = np.concatenate([np.zeros(y.shape[:-1] + (1,), dtype=np.int32), flips], axis=-1)
+    zcr = (flips[..., starts + frame_length - 1] - flips[..., starts]) / frame_length
+    del neg, flips
+
+    # frame energy = sum of frame_length // hop_length hop-sized block energies
+    # (block sums, not a running-sum difference, so silent frames stay exactly 0)
+    k = frame_length // hop_length
+    blocks = np.pad(y, pad)[..., :(n_frames + k - 1) * hop_length]
+    blocks = np.square(blocks.reshape(y.shape[:-1] + (-1, hop_length)), dtype=np.float64).sum(axis=-1)
+    energy = sum(blocks[..., j:j + n_frames] for j in range(k))
+    rms = np.sqrt(energy / frame_length)
+    return zcr, rms
+
+# ======================================================
+# ANALYSIS RATE POLICY
+# decode straight to one analysis rate that still covers Violet (<=20 kHz),
+# then make a single 16 kHz ASR copy with a polyphase resampler
+# ======================================================
+
+ASR_SR = 16000  # Whisper works best at 16k mono
+MIN_ANALYSIS_SR = 2 * BANDS["Violet"][1]
+
+_analysis_sr_env = os.getenv("ANALYSIS_SR", "44100").strip().lower()
+ANALYSIS_SR = None if _analysis_sr_env == "native" else int(_analysis_sr_env)
+if ANALYSIS_SR is not None and ANALYSIS_SR < MIN_ANALYSIS_SR:
+    raise ValueError(f"ANALYSIS_SR={ANALYSIS_SR} cannot represent the Violet band; use >= {MIN_ANALYSIS_SR} or 'native'.")
+
+def analysis_rate(native_sr):
+    # downsample 48/96 kHz sources; never upsample (there is nothing above Nyquist to recover)
+    if ANALYSIS_SR is None or native_sr <= ANALYSIS_SR:
+        return int(native_sr)
+    return ANALYSIS_SR
+
+def resample_poly_f32(y, orig_sr, target_sr):
+    if orig_sr == target_sr:
+        return y
+    g = math.gcd(int(orig_sr), int(target_sr))
+    out = scipy.signal.resample_poly(as_float32(y), int(target_sr) // g, int(orig_sr) // g)
+    return out.astype(np.float32, copy=False)
+
+def asr_copy(y, sr, store_key=None):
+    # the one 16 kHz copy per track (kept in the audio store when the track is stored)
+    if store_key:
+        return get_audio_store().derived(store_key, ASR_SR, lambda: resample_poly_f32(y, sr, ASR_SR))
+    return np.ascontiguousarray(resample_poly_f32(y, sr, ASR_SR), dtype=np.float32)
+
+# ======================================================
+# BAND AGGREGATION (cached bin edges + one np.add.reduceat)
+# every BANDS entry plus infra/ultra from a single pass over the spectrum
+# ======================================================
+
+INFRA_HZ = 20
+ULTRA_HZ = 18000
+
+def _first_bin(f, step, n_bins, strict=False):
+    # first rfft bin whose frequency is >= f (> f if strict); k*step matches np.fft.rfftfreq exactly
+    k = min(max(int(np.ceil(f / step)), 0), n_bins)
+    while k > 0 and ((k - 1) * step > f if strict else (k - 1) * step >= f):
+        k -= 1
+    while k < n_bins and (k * step <= f if strict else k * step < f):
+        k += 1
+    return k
+
+@lru_cache(maxsize=64)
+def band_bin_edges(n_fft, sr):
+    # -> (reduceat cut indices, {name: (first segment, end segment)})
+    n_bins = n_fft // 2 + 1
+    step = 1.0 / (n_fft * (1 / sr))
+    ranges = {b: (_first_bin(lo, step, n_bins), _first_bin(hi, step, n_bins)) for b, (lo, hi) in BANDS.items()}
+    ranges["infra"] = (0, _first_bin(INFRA_HZ, step, n_bins))
+    ranges["ultra"] = (_first_bin(ULTRA_HZ, step, n_bins, strict=True), n_bins)
+
+    bounds = sorted({0, n_bins, *(i for r in ranges.values() for i in r)})
+    pos = {b: i for i, b in enumerate(bounds)}
+    cuts = np.array(bounds[:-1], dtype=np.intp)
+    groups = {name: (pos[a], pos[b]) for name, (a, b) in ranges.items()}
+    return cuts, groups
+
+def aggregate_bands(spec, n_fft, sr, axis=0, acc=None):
+    # spec: magnitude spectrum (1-D) or spectrogram with frequency bins along `axis`
+    # -> {band..., "infra", "ultra", "total"}: floats for 1-D, arrays over the other axis for 2-D
+    cuts, groups = band_bin_edges(n_fft, sr)
+    # float64 accumulator for long 1-D spectra (millions of float32 bins);
+    # spectrogram columns are short enough to sum in their own dtype (acc=np.float64 for stacked long spectra)
+    if acc is None and np.ndim(spec) == 1:
+        acc = np.float64
+    seg = np.moveaxis(np.add.reduceat(spec, cuts, axis=axis, dtype=acc), axis, 0)
+    out = {name: seg[a:b].sum(axis=0) for name, (a, b) in groups.items()}
+    out["total"] = seg.sum(axis=0)
+    if np.ndim(spec) == 1:
+        out = {name: float(v) for name, v in out.items()}
+    return out
 
 # ======================================================
 # AUDIO SAFETY SIGNALS (noise / harshness / piercing tone / extremes)
 # ======================================================
 
-def compute_audio_safety(y, sr, fast_mode: bool):
+def compute_audio_safety(y, sr, fast_mode: bool, fft=None, bands=None):
+    # fft/bands: |rfft| of the same y_eval and its aggregate_bands, when the caller already has them
     y_eval = sample_audio_for_fft(y, sr) if fast_mode else y
 
-    rms = float(np.sqrt(np.mean(y_eval**2)) + 1e-12)
+    rms = float(np.sqrt(np.dot(y_eval, y_eval) / max(len(y_eval), 1)) + 1e-12)  # no y**2 temporary
     rms_db = float(20*np.log10(rms + 1e-12))
 
-    fft = np.abs(np.fft.rfft(y_eval))
-    freqs = np.fft.rfftfreq(len(y_eval), 1/sr)
-    total = float(np.sum(fft) + 1e-12)
+    if fft is None:
+        fft = magnitude_spectrum(y_eval)
+        bands = None
+    if bands is None:
+        bands = aggregate_bands(fft, len(y_eval), sr)
+    total = bands["total"] + 1e-12
 
-    infra_ratio = float(np.sum(fft[freqs < 20]) / total) if len(freqs) else 0.0
-    ultra_ratio = float(np.sum(fft[freqs > 18000]) / total) if len(freqs) else 0.0
+    infra_ratio = float(bands["infra"] / total)
+    ultra_ratio = float(bands["ultra"] / total)
 
-    crest = float((np.max(fft) + 1e-12) / (np.mean(fft) + 1e-12))
+    crest = float((np.max(fft) + 1e-12) / (np.mean(fft, dtype=np.float64) + 1e-12))
 
     hop = 512
     n_fft = 2048
-    centroid = librosa.feature.spectral_centroid(y=y_eval, sr=sr, n_fft=n_fft, hop_length=hop)[0]
-    rolloff = librosa.feature.spectral_rolloff(y=y_eval, sr=sr, n_fft=n_fft, hop_length=hop, roll_percent=0.85)[0]
-    flatness = librosa.feature.spectral_flatness(y=y_eval, n_fft=n_fft, hop_length=hop)[0]
-    zcr = librosa.feature.zero_crossing_rate(y=y_eval, frame_length=n_fft, hop_length=hop)[0]
-    rms_f = librosa.feature.rms(y=y_eval, frame_length=n_fft, hop_length=hop)[0]
+    # one float32 STFT shared by the three spectral features (was one each)
+    S = stft_magnitude(y_eval, n_fft=n_fft, hop_length=hop)
+    centroid, rolloff, flatness = spectral_features(S, sr, n_fft)
+    del S
+    zcr, rms_f = frame_zcr_rms(y_eval, frame_length=n_fft, hop_length=hop)
 
     def q(x, p):
         return float(np.quantile(x, p)) if len(x) else 0.0
 
-    c_med, c_p95 = q(centroid, 0.5), q(centroid, 0.95)
-    r_p95 = q(rolloff, 0.95)
-    f_med = q(flatness, 0.5)
-    z_med = q(zcr, 0.5)
-    rms_med, rms_p95 = q(rms_f, 0.5), q(rms_f, 0.95)
+    return score_audio_safety({
+        "rms_db": rms_db, "crest": crest, "infra_ratio": infra_ratio, "ultra_ratio": ultra_ratio,
+        "c_med": q(centroid, 0.5), "c_p95": q(centroid, 0.95), "r_p95": q(rolloff, 0.95),
+        "f_med": q(flatness, 0.5), "z_med": q(zcr, 0.5),
+        "rms_med": q(rms_f, 0.5), "rms_p95": q(rms_f, 0.95),
+    })
+
+def score_audio_safety(feat):
+    # thresholds -> points/flags/verdict inputs; shared by the per-track and batch paths
+    rms_db, crest = feat["rms_db"], feat["crest"]
+    infra_ratio, ultra_ratio = feat["infra_ratio"], feat["ultra_ratio"]
+    c_med, c_p95, r_p95 = feat["c_med"], feat["c_p95"], feat["r_p95"]
+    f_med, z_med = feat["f_med"], feat["z_med"]
+    rms_med, rms_p95 = feat["rms_med"], feat["rms_p95"]
 
     noise_like = (f_med > 0.35 and z_med > 0.08)
     piercing_tone = (c_med > 3800 and f_med < 0.18 and crest > 12.0)
@@ -734,6 +1260,145 @@ def compute_audio_safety(y, sr, fast_mode: bool):
         }
     }
 
+# ======================================================
+# BATCH DSP (catalog backfills)
+# equal-length FAST excerpts stacked as rows of one 2-D array: one rfft, one
+# multichannel STFT and one reduceat per batch; scoring is score_audio_safety
+# ======================================================
+
+def batch_audio_safety(Y, sr):
+    # Y: (tracks, samples), one FAST excerpt per row -> [(profile, audio_safety)] per row,
+    # matching compute_analysis(fast_mode=True) on the same excerpts
+    Y = np.ascontiguousarray(Y, dtype=np.float32)
+    n = Y.shape[1]
+    rms = np.sqrt(np.einsum("ij,ij->i", Y, Y) / max(n, 1)) + 1e-12
+    rms_db = 20 * np.log10(rms + 1e-12)
+
+    fft = np.abs(scipy.fft.rfft(Y, axis=1, workers=FFT_WORKERS))
+    bands = aggregate_bands(fft, n, sr, axis=1, acc=np.float64)
+    crest = (fft.max(axis=1) + 1e-12) / (fft.mean(axis=1, dtype=np.float64) + 1e-12)
+    del fft
+    total = bands["total"] + 1e-12
+    band_total = sum(bands[b] for b in BANDS)
+    band_total = np.where(band_total > 0, band_total, 1.0)
+
+    hop = 512
+    n_fft = 2048
+    S = stft_magnitude(Y, n_fft=n_fft, hop_length=hop)  # (tracks, bins, frames)
+    centroid, rolloff, flatness = spectral_features(S, sr, n_fft)
+    del S
+    zcr, rms_f = frame_zcr_rms(Y, frame_length=n_fft, hop_length=hop)
+
+    q = lambda x, p: np.quantile(x, p, axis=-1) if x.shape[-1] else np.zeros(len(Y))
+    feats = {
+        "rms_db": rms_db, "crest": crest,
+        "infra_ratio": bands["infra"] / total, "ultra_ratio": bands["ultra"] / total,
+        "c_med": q(centroid, 0.5), "c_p95": q(centroid, 0.95), "r_p95": q(rolloff, 0.95),
+        "f_med": q(flatness, 0.5), "z_med": q(zcr, 0.5),
+        "rms_med": q(rms_f, 0.5), "rms_p95": q(rms_f, 0.95),
+    }
+    out = []
+    for i in range(len(Y)):
+        profile = {b: float(bands[b][i] / band_total[i]) for b in BANDS}
+        out.append((profile, score_audio_safety({k: float(v[i]) for k, v in feats.items()})))
+    return out
+
+# ======================================================
+# BAND-ENERGY TIMELINE (spectral profile over time, per ~1 s window)
+# one STFT pass, block by block; bins -> BANDS via aggregate_bands
+# ======================================================
+
+TIMELINE_WINDOW_S = 1.0
+TIMELINE_N_FFT = 2048
+TIMELINE_HOP = 512
+TIMELINE_BLOCK_WINDOWS = 60   # STFT memory stays at ~1 minute of frames
+
+def band_timeline(y, sr, window_s=TIMELINE_WINDOW_S, n_fft=TIMELINE_N_FFT, hop=TIMELINE_HOP):
+    W = int(window_s * sr)
+    n_windows = int(np.ceil(len(y) / W)) if len(y) else 0
+    block = TIMELINE_BLOCK_WINDOWS * W
+
+    energy, power = [], []
+    for start in range(0, n_windows * W, block):
+        # frame j is centred on sample j*hop and counts toward the window holding its centre:
+        # a frame starting just before a boundary is mostly audio from after it
+        end = min(start + block, len(y))
+        j = np.arange(-(-start // hop), -(-end // hop))
+        if not len(j):
+            continue
+        lo, hi = int(j[0]) * hop - n_fft // 2, int(j[-1]) * hop - n_fft // 2 + n_fft
+        seg = y[max(lo, 0):min(hi, len(y))]
+        if lo < 0 or hi > len(y):
+            seg = np.pad(seg, (max(0, -lo), max(0, hi - len(y))))
+        S = stft_magnitude(seg, n_fft=n_fft, hop_length=hop, center=False)
+        agg = aggregate_bands(S, n_fft, sr, axis=0)
+        E = np.stack([agg[b] for b in BANDS])  # (bands, frames)
+        win_idx = (j * hop) // W
+        starts = np.flatnonzero(np.r_[True, np.diff(win_idx) != 0])
+        energy.append(np.add.reduceat(E, starts, axis=1))
+        # level from power (|X|^2), per frame so a short last window is not "quieter"
+        frames = np.diff(np.r_[starts, E.shape[1]])
+        power.append(np.add.reduceat(np.einsum("ft,ft->t", S, S), starts) / frames)
+
+    E = np.concatenate(energy, axis=1) if energy else np.zeros((len(BANDS), 0), dtype=np.float32)
+    total = E.sum(axis=0)
+    shares = E / np.maximum(total, 1e-12)
+    level = 10 * np.log10(np.concatenate(power) + 1e-12) if power else np.zeros(0)
+    return {
+        "window_s": float(window_s),
+        "times": (np.arange(E.shape[1]) * window_s).tolist(),
+        "shares": {b: shares[i].tolist() for i, b in enumerate(BANDS)},
+        "level_db": level.tolist(),
+        "flags": timeline_peak_flags(shares, level, window_s),
+    }
+
+def timeline_peak_flags(shares, level, window_s):
+    # per-window extremes that the whole-track profile averages away; level in dB (power)
+    if shares.shape[1] < 3:
+        return []
+    names = list(BANDS)
+    audible = level > (np.max(level) - 30)
+    if not np.any(audible):
+        return []
+
+    flags = []
+    bright = shares[names.index("Indigo")] + shares[names.index("Violet")]
+    i = int(np.argmax(np.where(audible, bright, 0.0)))
+    if bright[i] > 0.35 and bright[i] > 2 * float(np.median(bright[audible])):
+        flags.append(
+            f"Harsh peak at {pretty_duration(i * window_s)} — Indigo+Violet {bright[i]*100:.0f}% "
+            f"(track median {np.median(bright[audible])*100:.0f}%)"
+        )
+
+    red = shares[names.index("Red")]
+    i = int(np.argmax(np.where(audible, red, 0.0)))
+    if red[i] > 0.70 and red[i] > 1.5 * float(np.median(red[audible])):
+        flags.append(f"Heavy sub-bass surge at {pretty_duration(i * window_s)} — Red {red[i]*100:.0f}%")
+
+    # against two windows back: frames overlap the window edges, so a step that lands
+    # on a boundary is split across two windows
+    jump = level[2:] - level[:-2]
+    i = int(np.argmax(jump))
+    if jump[i] > 12.0 and audible[i + 2]:
+        onset = i + 1 if level[i + 1] - level[i] >= level[i + 2] - level[i + 1] else i + 2
+        flags.append(f"Sudden loud section at {pretty_duration(onset * window_s)} (+{jump[i]:.0f} dB within {2 * window_s:g} s)")
+    return flags
+
+def timeline_chart(timeline, title):
+    fig = Figure(figsize=(10,3))
+    ax = fig.subplots()
+    times = timeline["times"]
+    if times:
+        ax.stackplot(times, [timeline["shares"][b] for b in BANDS], labels=list(BANDS), colors=[COLORS[b] for b in BANDS])
+        ax.set_xlim(times[0], times[-1])
+    ax.set_ylim(0, 1)
+    ax.set_title(f"{title} — band energy over time")
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Share")
+    ax.legend(loc="upper left", bbox_to_anchor=(1.0, 1.0), fontsize="small")
+    fig.tight_layout()
+    return fig
+
 # ======================================================
 # SMART VOCAL / SPEECH GATING (to skip Whisper when pointless)
 # ======================================================
@@ -744,8 +1409,9 @@ def likely_has_vocals(y, sr):
     y_s = sample_audio_for_fft(y, sr)
     hop = 512
     n_fft = 2048
-    flat = librosa.feature.spectral_flatness(y=y_s, n_fft=n_fft, hop_length=hop)[0]
-    cent = librosa.feature.spectral_centroid(y=y_s, sr=sr, n_fft=n_fft, hop_length=hop)[0]
+    S = stft_magnitude(y_s, n_fft=n_fft, hop_length=hop)
+    flat = librosa.feature.spectral_flatness(S=S, n_fft=n_fft, hop_length=hop)[0]
+    cent = librosa.feature.spectral_centroid(S=S, sr=sr, n_fft=n_fft, hop_length=hop)[0]
     zcr = librosa.feature.zero_crossing_rate(y=y_s, frame_length=n_fft, hop_length=hop)[0]
     f_med = float(np.quantile(flat, 0.5))
     c_med = float(np.quantile(cent, 0.5))
@@ -777,7 +1443,7 @@ def pick_anchor_segments(y, sr, duration, seg_len=18.0, hop_s=2.0):
         starts = []
         for s in range(0, len(y) - win, step):
             seg = y[s:s+win]
-            rms = float(np.sqrt(np.mean(seg**2)) + 1e-12)
+            rms = float(np.sqrt(np.dot(seg, seg) / len(seg)) + 1e-12)
             rms_vals.append(rms)
             starts.append(s)
         if rms_vals:
@@ -792,130 +1458,560 @@ def pick_anchor_segments(y, sr, duration, seg_len=18.0, hop_s=2.0):
             cleaned.append(t)
     return cleaned[:4] # up to 4 segments
 
-def write_segment_wav(y, sr, start_s, seg_len, tmpdir):
-    start = int(start_s * sr)
-    end = int(min(len(y), start + int(seg_len * sr)))
-    seg = y[start:end]
-
-    # Whisper works best at 16k mono
-    target_sr = 16000
-    if sr != target_sr:
-        seg = librosa.resample(seg, orig_sr=sr, target_sr=target_sr)
-        sr2 = target_sr
-    else:
-        sr2 = sr
-
-    path = os.path.join(tmpdir, f"seg_{int(start_s*1000)}.wav")
-    sf.write(path, seg, sr2)
-    return path
-
-def transcribe_anchor_segments(y, sr, audio_path, fast_mode):
+def transcribe_anchor_segments(y, sr, fast_mode, y16=None, ctx=None):
     duration = len(y)/sr
     seg_len = 14.0 if fast_mode else 18.0
     anchors = pick_anchor_segments(y, sr, duration, seg_len=seg_len)
 
-    # if too short, just transcribe whole (rare)
-    model = get_whisper("tiny" if fast_mode else "base")
+    # segments are slices of the shared 16 kHz copy (no per-segment resample)
+    if y16 is None:
+        y16 = asr_copy(y, sr)
+    seg_n = int(seg_len * ASR_SR)
 
-    tmpdir = tempfile.mkdtemp(prefix="segs_")
-    try:
-        texts = []
-        for t in anchors:
-            p = write_segment_wav(y, sr, t, seg_len, tmpdir)
-            out = model.transcribe(p, fp16=torch.cuda.is_available())
+    size = "tiny" if fast_mode else "base"
+    cache = get_transcript_cache()
+    texts = []
+    cached = 0
+    for t in anchors:
+        start = int(t * ASR_SR)
+        seg = y16[start:start + seg_n]
+        key = cache.key(seg, size)
+        txt = cache.get(key)
+        if txt is None:
+            checkpoint(ctx, "whisper segment")
+            out = whisper_transcribe(size, seg)
             txt = (out.get("text") or "").strip()
-            if txt:
-                texts.append(txt)
-        return " ".join(texts).lower().strip()
-    finally:
-        shutil.rmtree(tmpdir, ignore_errors=True)
+            cache.put(key, txt)
+        else:
+            cached += 1
+        if txt:
+            texts.append(txt)
+    stats = {"segments": len(anchors), "cached": cached}
+    return " ".join(texts).lower().strip(), stats
+
+# ======================================================
+# FULL-TRACK LYRICS (chunked, parallel Whisper workers)
+# vocal regions -> ~30 s chunks -> process pool -> stitched in order
+# ======================================================
+
+LYRICS_CHUNK_S = 30.0
+LYRICS_WORKERS = int(os.getenv("LYRICS_WORKERS", "0")) or (os.cpu_count() or 1)
+LYRICS_START_METHOD = os.getenv("LYRICS_START_METHOD", "spawn")  # "fork": share preloaded weights, see preload_models
+
+_LYRICS_POOL = None
+_LYRICS_POOL_LOCK = threading.Lock()
+
+def split_vocal_chunks(y, sr, chunk_s=LYRICS_CHUNK_S, top_db=35, min_gap_s=1.0, min_chunk_s=1.0):
+    # non-silent regions (cheap RMS gate), merged across short pauses
+    intervals = librosa.effects.split(y, top_db=top_db, frame_length=2048, hop_length=512)
+    gap = int(min_gap_s * sr)
+    merged = []
+    for s, e in intervals:
+        if merged and s - merged[-1][1] <= gap:
+            merged[-1][1] = int(e)
+        else:
+            merged.append([int(s), int(e)])
+
+    # cut each region into near-equal pieces of ~chunk_s
+    chunk = int(chunk_s * sr)
+    chunks = []
+    for s, e in merged:
+        n = max(1, int(round((e - s) / chunk)))
+        edges = np.linspace(s, e, n + 1).astype(int)
+        chunks.extend((int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]))
+    return [(a, b) for a, b in chunks if b - a >= int(min_chunk_s * sr)]
+
+def _lyrics_worker_init(size, threads):
+    # runs once per worker process: pin threads and warm the model of the request that
+    # started the pool (other sizes load on first use)
+    torch.set_num_threads(threads)
+    if size:
+        get_whisper(size)
+
+def _lyrics_worker_transcribe(size, seg):
+    if isinstance(seg, tuple):
+        # (pcm path, start, end): zero-copy view of the shared 16 kHz store file
+        path, a, b = seg
+        seg = np.memmap(path, dtype=np.float32, mode="r")[a:b]
+    out = whisper_transcribe(size, seg)
+    return (out.get("text") or "").strip()
+
+def get_lyrics_pool(size=None):
+    global _LYRICS_POOL
+    with _LYRICS_POOL_LOCK:
+        if _LYRICS_POOL is None:
+            threads = max(1, (os.cpu_count() or 1) // LYRICS_WORKERS)
+            _LYRICS_POOL = ProcessPoolExecutor(
+                max_workers=LYRICS_WORKERS,
+                # spawn by default: torch/OpenMP state is not fork-safe once inference has run.
+                # fork only via start_lyrics_pool(), before any inference
+                mp_context=multiprocessing.get_context(LYRICS_START_METHOD),
+                initializer=_lyrics_worker_init,
+                initargs=(size, threads),
+            )
+        return _LYRICS_POOL
+
+def start_lyrics_pool():
+    # fork the workers now, while the process has only loaded weights: preloaded models
+    # are inherited copy-on-write. gc.freeze keeps the collector from writing to (and
+    # so un-sharing) the pages of every object that exists at this point
+    gc.collect()
+    gc.freeze()
+    pool = get_lyrics_pool()  # no warm-up: workers inherit whatever was preloaded
+    pool.submit(os.getpid).result()  # a fork pool starts all of its workers on the first submit
+    return pool
+
+def transcribe_full_lyrics(y, sr, fast_mode, y16=None, store_key=None, ctx=None):
+    t0 = time.perf_counter()
+    size = "tiny" if fast_mode else "base"
+
+    # chunks are found and cut on the shared 16 kHz copy; with a store key that
+    # copy is a file in the audio store and workers map it themselves
+    if y16 is None:
+        y16 = asr_copy(y, sr, store_key)
+    pcm16 = get_audio_store().path(store_key, ASR_SR) if store_key else None
+    bounds = split_vocal_chunks(y16, ASR_SR)
+    segs = [y16[a:b] for a, b in bounds]
+
+    # only chunks the transcript cache has not seen go to the worker pool
+    cache = get_transcript_cache()
+    keys = [cache.key(seg, size) for seg in segs]
+    texts = [cache.get(k) for k in keys]
+    todo = [i for i, txt in enumerate(texts) if txt is None]
+    if todo:
+        pool = get_lyrics_pool(size)
+        futs = [pool.submit(_lyrics_worker_transcribe, size, (pcm16, *bounds[i]) if pcm16 else segs[i]) for i in todo]
+        try:
+            for i, fut in zip(todo, futs):
+                # poll so a cancel/deadline is noticed between chunks, not after the whole track
+                while True:
+                    try:
+                        txt = fut.result(timeout=0.5)
+                        break
+                    except FutureTimeout:
+                        checkpoint(ctx, "lyrics chunk")
+                cache.put(keys[i], txt)
+                texts[i] = txt
+        except BaseException:
+            metric_inc("lyrics_chunks_aborted", sum(f.cancel() for f in futs))
+            raise
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "chunks": len(segs),
+        "cached": len(segs) - len(todo),
+        "workers": LYRICS_WORKERS,
+        "vocal_seconds": float(sum(b - a for a, b in bounds) / ASR_SR),
+        "elapsed": float(elapsed),
+        "rtf": float(elapsed / max(len(y) / sr, 1e-9)),
+    }
+    return " ".join(t for t in texts if t).lower().strip(), stats
+
+# ======================================================
+# AUDIO DECODING (ffmpeg -> mono float32 PCM, no intermediate WAV)
+# ======================================================
+
+MAX_DURATION_S = float(os.getenv("MAX_DURATION_S", "10800"))
+
+class AudioTooLong(Exception):
+    pass
+
+def check_duration(seconds):
+    if seconds and seconds > MAX_DURATION_S:
+        raise AudioTooLong(
+            f"Audio is {pretty_duration(seconds)} long; the limit is {pretty_duration(MAX_DURATION_S)}."
+        )
+
+def probe_sample_rate(path):
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=sample_rate", "-of", "csv=p=0", path,
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.strip()
+    except FileNotFoundError:
+        raise RuntimeError("ffprobe not found. ffmpeg may be missing.")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Could not read audio stream: {e.stderr.strip()[-300:]}")
+    if not out:
+        raise RuntimeError("No audio stream found in file.")
+    try:
+        return int(out.split(",")[0])
+    except ValueError:
+        raise RuntimeError(f"Unexpected sample rate from ffprobe: {out[:50]!r}")
+
+def probe_duration(path):
+    # container duration, read before decoding so admission can price the job
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.strip()
+        return float(out)
+    except (FileNotFoundError, subprocess.CalledProcessError, ValueError):
+        return None
+
+def decode_audio(path, sr=None):
+    # sr=None applies the analysis-rate policy to the stream's native rate
+    if sr is None:
+        sr = analysis_rate(probe_sample_rate(path))
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error", "-i", path,
+        "-vn", "-ac", "1", "-ar", str(sr), "-f", "f32le", "-",
+    ]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, check=False)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg not found. ffmpeg may be missing.")
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode audio: {proc.stderr.decode(errors='ignore').strip()[-300:]}")
+    y = np.frombuffer(proc.stdout, dtype=np.float32)
+    if len(y) == 0:
+        raise RuntimeError("Decoded audio is empty.")
+    return y, sr
+
+def decode_excerpts(path, sr):
+    # only the FAST excerpt windows, via input seeking (one ffmpeg, one input per window);
+    # -> (excerpt as float32, full duration in seconds). Short tracks decode whole.
+    duration = probe_duration(path)
+    if not duration:
+        raise RuntimeError("Could not read the audio duration.")
+    bounds = fast_excerpt_bounds(int(duration * sr), sr)
+    if len(bounds) == 1:
+        return decode_audio(path, sr)[0], duration
+    cmd = ["ffmpeg", "-nostdin", "-v", "error"]
+    for a, b in bounds:
+        cmd += ["-ss", f"{a / sr:.6f}", "-t", f"{(b - a) / sr:.6f}", "-i", path]
+    k = len(bounds)
+    cmd += [
+        "-filter_complex", "".join(f"[{i}:a:0]" for i in range(k)) + f"concat=n={k}:v=0:a=1[a]",
+        "-map", "[a]", "-ac", "1", "-ar", str(sr), "-f", "f32le", "-",
+    ]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, check=False)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg not found. ffmpeg may be missing.")
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode audio: {proc.stderr.decode(errors='ignore').strip()[-300:]}")
+    # seeking can land a few samples off; pin the length so excerpts stack
+    y = librosa.util.fix_length(np.frombuffer(proc.stdout, dtype=np.float32), size=sum(b - a for a, b in bounds))
+    return y, duration
+
+def prune_cache_dir(directory, max_bytes, keep=None, skip=None):
+    # least-recently-used first (mtime is touched on every hit); files still
+    # being written (.part) and names matching skip() are left alone
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and not entry.name.endswith(".part") and not (skip and skip(entry.name)):
+            st = entry.stat()
+            files.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+# ======================================================
+# DECODED AUDIO STORE (memory-mapped float32 PCM keyed by a hash of the whole stream)
+# decoded once, written by ffmpeg straight to disk; every stage and every
+# worker process reads read-only views of the same page-cache pages
+# ======================================================
+
+PCM_DIR = os.path.join(CACHE_DIR, "pcm")
+PCM_STORE_MAX_BYTES = int(float(os.getenv("PCM_STORE_MAX_MB", "4096")) * 1024 * 1024)
+
+class AudioStore:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sources = {}  # (source path, size, mtime) -> (key, sr)
+        self._pins = {}     # key -> count; every rate of a pinned key survives pruning
+        os.makedirs(directory, exist_ok=True)
+
+    def pin(self, key):
+        # for work that reopens a key later (queued tier-2 jobs), after its source may be gone
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key):
+        with self._lock:
+            if self._pins.get(key, 0) <= 1:
+                self._pins.pop(key, None)
+            else:
+                self._pins[key] -= 1
+
+    def _prune(self, keep):
+        with self._lock:
+            pinned = set(self._pins)
+        prune_cache_dir(self.directory, self.max_bytes, keep=keep, skip=lambda name: name.split(".", 1)[0] in pinned)
+
+    def path(self, key, sr):
+        return os.path.join(self.directory, f"{key}.{int(sr)}.f32")
+
+    def open(self, key, sr):
+        path = self.path(key, sr)
+        if os.path.getsize(path) == 0:
+            raise RuntimeError("Decoded audio is empty.")
+        os.utime(path)
+        return np.memmap(path, dtype=np.float32, mode="r")
+
+    def _source_id(self, src_path, sr):
+        st = os.stat(src_path)
+        return (os.path.realpath(src_path), st.st_size, st.st_mtime_ns, sr)
+
+    def decode(self, src_path, sr=None):
+        # returns (read-only memmap, sr, key)
+        if sr is None:
+            sr = analysis_rate(probe_sample_rate(src_path))
+        src_id = self._source_id(src_path, sr)
+        with self._lock:
+            known = self._sources.get(src_id)
+        if known and os.path.exists(self.path(*known)):
+            metric_inc("pcm_store_hits")
+            return self.open(*known), sr, known[0]
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        os.close(fd)
+        cmd = [
+            "ffmpeg", "-nostdin", "-v", "error", "-y", "-i", src_path,
+            "-vn", "-ac", "1", "-ar", str(sr), "-f", "f32le", tmp,
+        ]
+        try:
+            proc = subprocess.run(cmd, capture_output=True, check=False)
+        except FileNotFoundError:
+            os.remove(tmp)
+            raise RuntimeError("ffmpeg not found. ffmpeg may be missing.")
+        if proc.returncode != 0 or os.path.getsize(tmp) == 0:
+            os.remove(tmp)
+            err = proc.stderr.decode(errors="ignore").strip()[-300:]
+            raise RuntimeError(f"ffmpeg could not decode audio: {err or 'empty output'}")
+
+        # the whole decoded stream names the file: two tracks that differ anywhere
+        # (a muted word) must never share one
+        h = hashlib.sha1(str(sr).encode())
+        with open(tmp, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        key = h.hexdigest()
+        final = self.path(key, sr)
+        if os.path.exists(final):
+            os.remove(tmp)
+            metric_inc("pcm_store_hits")
+        else:
+            os.replace(tmp, final)
+            metric_inc("pcm_store_writes")
+            self._prune(final)
+        with self._lock:
+            self._sources[src_id] = (key, sr)
+        return self.open(key, sr), sr, key
+
+    def derived(self, key, sr, make):
+        # a second rate of the same audio (e.g. the 16 kHz ASR copy), computed once
+        path = self.path(key, sr)
+        if not os.path.exists(path):
+            arr = np.ascontiguousarray(make(), dtype=np.float32)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+            with os.fdopen(fd, "wb") as f:
+                arr.tofile(f)
+            os.replace(tmp, path)
+            self._prune(path)
+        return self.open(key, sr)
+
+@lru_cache(maxsize=1)
+def get_audio_store():
+    return AudioStore(PCM_DIR, PCM_STORE_MAX_BYTES)
 
 # ======================================================
 # YOUTUBE DOWNLOAD (no cookies UI; clean error hint)
+# compressed stream kept in a bounded on-disk cache; concurrent
+# requests for the same video share one in-flight download
 # ======================================================
 
-def download_youtube_audio(url: str, fast_mode: bool):
-    tmpdir = tempfile.mkdtemp(prefix="yt_")
-    outtmpl = os.path.join(tmpdir, "audio.%(ext)s")
+YT_CACHE_DIR = os.path.join(CACHE_DIR, "yt")
+YT_CACHE_MAX_BYTES = int(float(os.getenv("YT_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+# metadata lookups are cheap and bursty; downloads are capped on their own,
+# independently of how many analyses may run at once
+METADATA_CONCURRENCY = int(os.getenv("METADATA_CONCURRENCY", "8"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "2"))
+METADATA_EXECUTOR = ThreadPoolExecutor(METADATA_CONCURRENCY, thread_name_prefix="yt-meta")
+DOWNLOAD_EXECUTOR = ThreadPoolExecutor(DOWNLOAD_CONCURRENCY, thread_name_prefix="yt-dl")
+
+_YT_INFLIGHT = {}
+_YT_INFLIGHT_LOCK = threading.Lock()
+
+class UnsupportedSource(Exception):
+    pass
+
+def _yt_cached_file(video_id, quality):
+    pattern = os.path.join(YT_CACHE_DIR, f"{glob.escape(video_id)}.{quality}.*")
+    for path in glob.glob(pattern):
+        if not path.endswith((".part", ".ytdl")):
+            return path
+    return None
+
+def _ydl_opts(fast_mode):
+    quality = "lo" if fast_mode else "hi"
     fmt = "bestaudio[abr<=96]/bestaudio" if fast_mode else "bestaudio/best"
-    ydl_opts = {
+    return quality, {
         "format": fmt,
-        "outtmpl": outtmpl,
+        "outtmpl": os.path.join(YT_CACHE_DIR, f"%(id)s.{quality}.%(ext)s"),
         "noplaylist": True,
         "quiet": True,
         "no_warnings": True,
         "retries": 3,
         "fragment_retries": 3,
         "extractor_args": {"youtube": {"player_client": ["android"]}},
-        "postprocessors": [{"key":"FFmpegExtractAudio","preferredcodec":"wav"}],
     }
 
+def resolve_youtube_metadata(url: str, fast_mode: bool):
+    # id / title / duration without downloading anything
+    _, ydl_opts = _ydl_opts(fast_mode)
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.extract_info(url, download=False)
+
+def _download_youtube_stream(info, fast_mode, waiters):
+    os.makedirs(YT_CACHE_DIR, exist_ok=True)
+    quality, ydl_opts = _ydl_opts(fast_mode)
+
+    def _abort_when_abandoned(_progress):
+        # a shared download stops only once every waiting request is gone or out of time
+        if waiters and all(c.cancelled or c.expired for c in waiters):
+            if any(c.cancelled for c in waiters):
+                raise RequestCancelled("download")
+            raise DeadlineExceeded("download")
+
+    ydl_opts["progress_hooks"] = [_abort_when_abandoned]
+    metric_inc("yt_downloads")
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=True)
-        title = info.get("title", "Unknown title")
-        channel = info.get("uploader", "Unknown channel")
+        ydl.process_ie_result(info, download=True)
+    path = _yt_cached_file(info["id"], quality)
+    if not path:
+        raise RuntimeError("Audio stream was not downloaded.")
+    prune_cache_dir(YT_CACHE_DIR, YT_CACHE_MAX_BYTES, keep=path)
+    return path
 
-    wav_path = os.path.join(tmpdir, "audio.wav")
-    if not os.path.exists(wav_path):
-        raise RuntimeError("WAV not created. ffmpeg may be missing.")
-    return wav_path, title, channel, tmpdir
+def submit_youtube_download(info, fast_mode, ctx=None):
+    # returns a Future for the cached stream path; one in-flight download per video
+    quality, _ = _ydl_opts(fast_mode)
+    key = (info["id"], quality)
+
+    path = _yt_cached_file(*key)
+    if path:
+        os.utime(path)
+        metric_inc("yt_cache_hits")
+        fut = Future()
+        fut.set_result(path)
+        return fut
+
+    with _YT_INFLIGHT_LOCK:
+        entry = _YT_INFLIGHT.get(key)
+        if entry is not None:
+            fut, waiters = entry
+            if ctx is not None:
+                waiters.append(ctx)
+            metric_inc("yt_downloads_shared")
+            return fut
+        waiters = [ctx] if ctx is not None else []
+        fut = DOWNLOAD_EXECUTOR.submit(_download_youtube_stream, info, fast_mode, waiters)
+        _YT_INFLIGHT[key] = (fut, waiters)
+
+    def _done(f):
+        with _YT_INFLIGHT_LOCK:
+            if _YT_INFLIGHT.get(key, (None,))[0] is f:
+                del _YT_INFLIGHT[key]
+    fut.add_done_callback(_done)
+    return fut
 
 # ======================================================
 # GLOBAL CACHE (repeat runs become instant)
 # ======================================================
+# full results are keyed on the exact audio; near-duplicates (perceptual key) share only
+# DSP_CACHE, since the small edits the fingerprint ignores (a radio edit) change the lyrics
 ANALYSIS_CACHE = {}
+DSP_CACHE = {}
+# (source id, fast, full lyrics) -> ANALYSIS_CACHE key, so seen videos skip the download
+# and repeated API uploads skip the decode; source id is a video id or "sha1:<upload digest>"
+SOURCE_KEYS = {}
+
+def cached_source_result(source_id, fast_mode, full_lyrics):
+    key = SOURCE_KEYS.get((source_id, bool(fast_mode), bool(full_lyrics)))
+    return ANALYSIS_CACHE.get(key) if key else None
 
 # ======================================================
 # CORE ANALYSIS
+# compute_analysis -> plain dict (cached, title-independent)
+# render_analysis  -> chart + markdown for one title/channel
 # ======================================================
 
-def analyze_audio(audio_path, fast_mode, title, channel):
-    y, sr = librosa.load(audio_path, sr=None, mono=True)
-    duration = len(y) / sr
-
-    # cache key from waveform fingerprint + mode + title
-    key = f"{audio_fingerprint(y, sr)}::{int(fast_mode)}::{title}"
-    if key in ANALYSIS_CACHE:
-        return ANALYSIS_CACHE[key]
+RISK_MODERATION = 8
+RISK_NOT = 22
 
+def compute_dsp(y, sr, fast_mode, ctx=None):
     # FFT band profile (sampled in fast)
     y_fft = sample_audio_for_fft(y, sr) if fast_mode else y
-    fft = np.abs(np.fft.rfft(y_fft))
-    freqs = np.fft.rfftfreq(len(y_fft), 1/sr)
+    fft = magnitude_spectrum(y_fft)
+    bands = aggregate_bands(fft, len(y_fft), sr)
 
-    band_energy = {}
-    for b,(lo,hi) in BANDS.items():
-        idx = np.where((freqs>=lo)&(freqs<hi))[0]
-        band_energy[b] = float(np.sum(fft[idx]))
+    band_energy = {b: bands[b] for b in BANDS}
     total = sum(band_energy.values()) or 1.0
     profile = {b: float(band_energy[b]/total) for b in band_energy}
 
-    # audio safety (fast uses sampled internally)
-    audio_safety = compute_audio_safety(y, sr, fast_mode)
+    # DSP stages always finish (they are the degraded verdict); only a cancel stops them
+    checkpoint(ctx, "audio safety", deadline=False)
 
-    # chart
-    fig = plt.figure(figsize=(10,4))
-    plt.bar(profile.keys(), profile.values(), color=[COLORS[b] for b in profile])
-    plt.title(f"{title} — {channel}")
-    plt.ylabel("Relative Energy")
-    plt.tight_layout()
+    # audio safety (fast uses sampled internally; same spectrum, no second FFT)
+    audio_safety = compute_audio_safety(y, sr, fast_mode, fft=fft, bands=bands)
+    checkpoint(ctx, "timeline", deadline=False)
 
-    # ====== Lyrics transcription (Option A) with gating ======
-    lyrics = ""
-    lang = "unknown"
-    sent = {"negative": 0.0, "neutral": 1.0, "positive": 0.0}
+    # per-second band timeline (whole track, both modes; FAST skips the frame overlap)
+    timeline = band_timeline(y, sr, hop=TIMELINE_N_FFT if fast_mode else TIMELINE_HOP)
+    checkpoint(ctx, "lyrics gate", deadline=False)
 
     # if noise-like/piercing, skip lyrics for speed (usually no lyrics anyway)
     do_lyrics = (audio_safety["sound_type"] == "Music-like / tonal") and likely_has_vocals(y, sr)
+    return {"profile": profile, "audio_safety": audio_safety, "timeline": timeline, "do_lyrics": bool(do_lyrics)}
 
-    if do_lyrics:
-        lyrics = transcribe_anchor_segments(y, sr, audio_path, fast_mode=fast_mode)
-        if lyrics:
-            try:
-                lang = detect(lyrics)
-            except LangDetectException:
-                lang = "unknown"
-            sent = roberta_sentiment(lyrics)
+def compute_analysis(y, sr, fast_mode, full_lyrics=False, store_key=None, y16=None, ctx=None, audio_only=False, dsp=None):
+    # audio_only: decide do_lyrics but leave transcription to a later tier
+    # dsp: compute_dsp output to reuse (e.g. from a near-duplicate of this audio)
+    duration = len(y) / sr
+    degraded = None
+    if dsp is None:
+        dsp = compute_dsp(y, sr, fast_mode, ctx=ctx)
+    profile, audio_safety, timeline, do_lyrics = dsp["profile"], dsp["audio_safety"], dsp["timeline"], dsp["do_lyrics"]
+
+    # ====== Lyrics transcription (Option A) with gating ======
+    lyrics = ""
+    lang = "unknown"
+    sent = {"negative": 0.0, "neutral": 1.0, "positive": 0.0}
+    lyrics_stats = None
+
+    if do_lyrics and not audio_only:
+        try:
+            checkpoint(ctx, "lyrics")
+            if full_lyrics:
+                lyrics, lyrics_stats = transcribe_full_lyrics(y, sr, fast_mode=fast_mode, y16=y16, store_key=store_key, ctx=ctx)
+            else:
+                lyrics, lyrics_stats = transcribe_anchor_segments(y, sr, fast_mode=fast_mode, y16=y16, ctx=ctx)
+            if lyrics:
+                try:
+                    lang = detect(lyrics)
+                except LangDetectException:
+                    lang = "unknown"
+                checkpoint(ctx, "sentiment")
+                sent = roberta_sentiment(lyrics)
+        except DeadlineExceeded:
+            # out of time: fall back to the DSP-only verdict
+            lyrics, lyrics_stats, lang = "", None, "unknown"
+            sent = {"negative": 0.0, "neutral": 1.0, "positive": 0.0}
+            degraded = "deadline"
+            metric_inc("requests_degraded")
 
     # Lexicon scores (still computed, but NOT shown as "Detected Themes")
     scores = {
@@ -947,9 +2043,9 @@ def analyze_audio(audio_path, fast_mode, title, channel):
     )
 
     # Verdict
-    if scores["selfharm"] >= 1 or audio_safety["hard_not"] or risk_points >= 22:
+    if scores["selfharm"] >= 1 or audio_safety["hard_not"] or risk_points >= RISK_NOT:
         verdict = "NOT RECOMMENDED"
-    elif risk_points >= 8:
+    elif risk_points >= RISK_MODERATION:
         verdict = "USE WITH MODERATION"
     else:
         verdict = "RECOMMENDED"
@@ -959,6 +2055,41 @@ def analyze_audio(audio_path, fast_mode, title, channel):
     if verdict == "RECOMMENDED" and scores.get('explicit', 0) >= 1:
         verdict = "USE WITH MODERATION"
 
+    return {
+        "fast_mode": bool(fast_mode),
+        "duration": float(duration),
+        "profile": profile,
+        "audio_safety": audio_safety,
+        "timeline": timeline,
+        "do_lyrics": bool(do_lyrics),
+        "lyrics": lyrics,
+        "lyrics_stats": lyrics_stats,
+        "lang": lang,
+        "sentiment": sent,
+        "scores": scores,
+        "risk_points": int(risk_points),
+        "verdict": verdict,
+        "degraded": degraded,
+    }
+
+def render_analysis(result, title, channel):
+    profile = result["profile"]
+    audio_safety = result["audio_safety"]
+    sent = result["sentiment"]
+    verdict = result["verdict"]
+    lyrics_stats = result["lyrics_stats"]
+
+    # chart: a standalone Figure, not pyplot's shared current figure, since renders run
+    # concurrently on executor threads; nothing global holds it, so it is freed after use
+    fig = Figure(figsize=(10,4))
+    ax = fig.subplots()
+    ax.bar(profile.keys(), profile.values(), color=[COLORS[b] for b in profile])
+    ax.set_title(f"{title} — {channel}")
+    ax.set_ylabel("Relative Energy")
+    fig.tight_layout()
+
+    timeline_fig = timeline_chart(result["timeline"], title)
+
     # USER OUTPUT (NO "Detected Themes")
     lines = []
     lines.append(f"# 🎵 {title}")
@@ -966,12 +2097,30 @@ def analyze_audio(audio_path, fast_mode, title, channel):
     lines.append(f"## Verdict: **{verdict}**")
 
     lines.append("### Listening Context")
-    lines.append(f"- **Mode:** {'FAST' if fast_mode else 'ACCURATE'}")
-    lines.append(f"- **Length:** {pretty_duration(duration)}")
+    if result.get("tier") == 1:
+        lines.append("- **Mode:** TIERED — instant audio-only verdict")
+    else:
+        lines.append(f"- **Mode:** {'FAST' if result['fast_mode'] else 'ACCURATE'}")
+    lines.append(f"- **Length:** {pretty_duration(result['duration'])}")
     lines.append(f"- **Sound type:** {audio_safety['sound_type']}")
+    if lyrics_stats and "chunks" in lyrics_stats:
+        lines.append(
+            f"- **Lyrics coverage:** Full track — {lyrics_stats['chunks']} chunks "
+            f"({lyrics_stats['cached']} from transcript cache), "
+            f"real-time factor {lyrics_stats['rtf']:.2f} ({lyrics_stats['workers']} workers)"
+        )
+    elif lyrics_stats:
+        lines.append(
+            f"- **Lyrics coverage:** Anchor segments — {lyrics_stats['segments']} segments "
+            f"({lyrics_stats['cached']} from transcript cache)"
+        )
+    if result.get("tier") == 1 and result["do_lyrics"]:
+        lines.append("- **Lyrics:** not analyzed in the instant tier")
+    if result.get("degraded") == "deadline":
+        lines.append("- **Lyrics:** skipped — time budget reached; verdict uses audio signals only")
 
     # explain sentiment in human language (only if lyrics used)
-    if do_lyrics and lyrics:
+    if result["do_lyrics"] and result["lyrics"]:
         lines.append("### Lyric Emotional Signal (summary)")
         # translate internal numbers to plain language
         neg, neu, pos = sent["negative"], sent["neutral"], sent["positive"]
@@ -985,6 +2134,11 @@ def analyze_audio(audio_path, fast_mode, title, channel):
             tone = "Mixed emotional tone (push-pull language; not clearly one-sided)"
         lines.append(f"- **Tone:** {tone}")
 
+    if result["timeline"]["flags"]:
+        lines.append("### Peak Moments")
+        for flag in result["timeline"]["flags"]:
+            lines.append(f"- {flag}")
+
     # Short reason
     lines.append("\n---\n## Frequency Insights")
     for b in BANDS:
@@ -1001,61 +2155,624 @@ def analyze_audio(audio_path, fast_mode, title, channel):
             lines.append(f"- **Effect:** {eff}")
             lines.append(f"- **Risk:** {info['risk']}")
 
-    result = (fig, "\n".join(lines))
-    ANALYSIS_CACHE[key] = result
-    return result
+    return fig, timeline_fig, "\n".join(lines)
+
+def cached_dsp(y, sr, fast_mode, y16, ctx=None):
+    # DSP half, shared by near-duplicates (perceptual key) + mode
+    key = f"{canonical_audio_key(y16, ASR_SR)}::{int(fast_mode)}"
+    dsp = DSP_CACHE.get(key)
+    if dsp is None:
+        dsp = DSP_CACHE[key] = compute_dsp(y, sr, fast_mode, ctx=ctx)
+    else:
+        metric_inc("dsp_cache_hits")
+    return key, dsp
+
+def cached_analysis(y, sr, fast_mode, full_lyrics=False, store_key=None, ctx=None):
+    # one 16 kHz copy serves the fingerprints and every Whisper segment
+    y16 = asr_copy(y, sr, store_key)
+
+    # full result: exact audio + mode + lyrics coverage. A near-duplicate reuses the DSP
+    # half and transcribes again (unchanged segments come from the transcript cache)
+    key = f"{exact_audio_key(y16)}::{int(fast_mode)}::{int(full_lyrics)}"
+    result = ANALYSIS_CACHE.get(key)
+    if result is None:
+        _, dsp = cached_dsp(y, sr, fast_mode, y16, ctx=ctx)
+        result = compute_analysis(y, sr, fast_mode, full_lyrics=full_lyrics, store_key=store_key, y16=y16, ctx=ctx, dsp=dsp)
+        if not result["degraded"]:
+            ANALYSIS_CACHE[key] = result
+    return key, result
+
+def analyze_path(path, fast_mode, full_lyrics=False, ctx=None):
+    checkpoint(ctx, "decode", deadline=False)
+    y, sr, store_key = get_audio_store().decode(path)
+    check_duration(len(y) / sr)
+    return cached_analysis(y, sr, fast_mode, full_lyrics=full_lyrics, store_key=store_key, ctx=ctx)
+
+# ======================================================
+# TIERED ANALYSIS
+# tier 1: the sampled DSP path only (about a second); tier 2: the full ACCURATE
+# analysis in the background, started only when lyrics or DSP sampling error
+# could still change the tier-1 verdict
+# ======================================================
+
+TIER_MARGIN = int(os.getenv("TIER_MARGIN", "4"))  # audio points of slack for the sampled DSP
+
+def tier2_reason(result):
+    # why the tier-1 verdict may not be final (None when it is)
+    points = result["audio_safety"]["points"]
+    if result["audio_safety"]["hard_not"] or points >= RISK_NOT + TIER_MARGIN:
+        return None  # NOT RECOMMENDED already, and lyrics only ever add points
+    if result["do_lyrics"]:
+        return "vocals detected, lyrics could change the verdict"
+    if any(abs(points - t) < TIER_MARGIN for t in (RISK_MODERATION, RISK_NOT)):
+        return "audio score is near a verdict threshold"
+    return None
+
+def tier1_path(path, full_lyrics=False, ctx=None):
+    # -> (ACCURATE cache key, result, (store key, sr)); result is the ACCURATE one once tier 2 has run
+    y, sr, store_key = get_audio_store().decode(path)
+    check_duration(len(y) / sr)
+    y16 = asr_copy(y, sr, store_key)
+    key = f"{exact_audio_key(y16)}::0::{int(full_lyrics)}"
+    result = ANALYSIS_CACHE.get(key)
+    if result is None:
+        # audio-only, so near-duplicates may share it
+        dsp_key, dsp = cached_dsp(y, sr, True, y16, ctx=ctx)
+        result = ANALYSIS_CACHE.get(f"{dsp_key}::tier1")
+        if result is None:
+            result = compute_analysis(y, sr, True, store_key=store_key, y16=y16, ctx=ctx, audio_only=True, dsp=dsp)
+            result.update(tier=1, tier2_reason=tier2_reason(result))
+            ANALYSIS_CACHE[f"{dsp_key}::tier1"] = result
+    return key, result, (store_key, sr)
+
+def tier2_analysis(store, full_lyrics, ctx):
+    store_key, sr = store
+    y = get_audio_store().open(store_key, sr)
+    return cached_analysis(y, sr, False, full_lyrics=full_lyrics, store_key=store_key, ctx=ctx)
 
 # ======================================================
 # GRADIO RUNNER
 # ======================================================
 
-def run(upload, yt, fast):
-    tmp=None
-    try:
-        if yt and yt.strip():
-            path, title, channel, tmp = download_youtube_audio(yt.strip(), fast)
-        else:
-            path = upload
-            title = os.path.basename(upload) if upload else "Local file"
-            channel = "Local upload"
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "2"))
+ANALYSIS_EXECUTOR = ThreadPoolExecutor(ANALYSIS_CONCURRENCY, thread_name_prefix="analysis")
 
-        if not path:
-            return None, "Please upload an audio file OR paste a YouTube link."
+# ======================================================
+# ADMISSION CONTROL
+# cost = audio seconds x mode weight, priced from metadata/ffprobe before any work.
+# Short jobs are granted analysis slots ahead of long ones, long jobs never hold
+# more than MAX_LONG_JOBS slots, and jobs over MAX_JOB_COST_S are downgraded or rejected.
+# ======================================================
 
-        return analyze_audio(path, fast, title, channel)
+SHORT_JOB_COST_S = float(os.getenv("SHORT_JOB_COST_S", "900"))
+MAX_LONG_JOBS = max(1, min(int(os.getenv("MAX_LONG_JOBS", "1")), ANALYSIS_CONCURRENCY))
+MAX_JOB_COST_S = float(os.getenv("MAX_JOB_COST_S", "10800"))
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "64"))
+# a long job waiting longer than this goes ahead of newer short jobs (aging); this is what
+# keeps it moving when no slot can be reserved for it (ANALYSIS_CONCURRENCY == MAX_LONG_JOBS)
+LONG_JOB_MAX_WAIT_S = float(os.getenv("LONG_JOB_MAX_WAIT_S", "60"))
+OVER_LIMIT_POLICY = os.getenv("OVER_LIMIT_POLICY", "downgrade")  # or "reject"
+
+# relative analysis cost per audio second
+COST_WEIGHTS = {"accurate": 1.0, "fast": 0.4, "full_lyrics": 3.0}
+
+class AdmissionRejected(Exception):
+    pass
+
+class QueueFull(AdmissionRejected):
+    pass
+
+def estimate_cost(duration, fast_mode, full_lyrics):
+    w = COST_WEIGHTS["fast" if fast_mode else "accurate"]
+    if full_lyrics:
+        w *= COST_WEIGHTS["full_lyrics"]
+    return (duration or 0.0) * w
+
+def plan_admission(duration, fast_mode, full_lyrics):
+    # -> (fast_mode, full_lyrics, cost, note); note is set when the request was downgraded
+    cost = estimate_cost(duration, fast_mode, full_lyrics)
+    if cost <= MAX_JOB_COST_S:
+        return fast_mode, full_lyrics, cost, None
+    if OVER_LIMIT_POLICY == "downgrade":
+        steps = []
+        if full_lyrics:
+            full_lyrics = False
+            steps.append("anchor-segment lyrics")
+        if estimate_cost(duration, fast_mode, full_lyrics) > MAX_JOB_COST_S and not fast_mode:
+            fast_mode = True
+            steps.append("FAST mode")
+        cost = estimate_cost(duration, fast_mode, full_lyrics)
+        if steps and cost <= MAX_JOB_COST_S:
+            metric_inc("admission_downgraded")
+            return fast_mode, full_lyrics, cost, f"Long input: analyzed with {' and '.join(steps)} to stay within the service limits."
+    metric_inc("admission_rejected")
+    raise AdmissionRejected(
+        f"This {pretty_duration(duration)} input is too expensive to analyze with the selected options. "
+        "Try FAST mode, turn off full-track lyrics, or upload a shorter excerpt."
+    )
 
+class AdmissionScheduler:
+    # lives on the server's event loop; all bookkeeping happens on that thread
+    def __init__(self, slots, long_slots, max_queue):
+        self.slots, self.long_slots, self.max_queue = slots, long_slots, max_queue
+        self._running = {"short": 0, "long": 0}
+        self._waiting = []  # heap of (rank, cost, seq, lane, future, enqueued); rank -1 aged long, 0 short, 1 long, 2 background
+        self._seq = itertools.count()
+
+    def lane(self, cost):
+        return "short" if cost <= SHORT_JOB_COST_S else "long"
+
+    def _publish(self):
+        for lane in ("short", "long"):
+            metric_set(f"queue_depth_{lane}", sum(1 for w in self._waiting if w[3] == lane and not w[4].done()))
+            metric_set(f"running_{lane}", self._running[lane])
+
+    def _age(self):
+        now = time.monotonic()
+        aged = [i for i, w in enumerate(self._waiting) if w[0] == 1 and now - w[5] > LONG_JOB_MAX_WAIT_S]
+        for i in aged:
+            self._waiting[i] = (-1,) + self._waiting[i][1:]
+        if aged:
+            heapq.heapify(self._waiting)
+            metric_inc("admission_long_aged", len(aged))
+
+    @staticmethod
+    def _interactive_long(items):
+        # slots are only reserved for requests someone waits on, never for background work
+        return any(w[3] == "long" and w[0] != 2 and not w[4].done() for w in items)
+
+    def _dispatch(self):
+        # shorts are granted first, but while a long job waits its share of slots
+        # is kept for it, so long jobs are capped without being starved
+        self._age()
+        held = []
+        long_waiting = self._interactive_long(self._waiting)
+        while self._waiting and sum(self._running.values()) < self.slots:
+            item = heapq.heappop(self._waiting)
+            lane, fut = item[3], item[4]
+            if fut.done():  # waiter went away
+                continue
+            if item[0] == 2 and any(h[0] != 2 for h in held):
+                # background pops last; any request still held here is waiting, so the
+                # slot stays free for it rather than going to refinement work
+                held.append(item)
+                continue
+            if lane == "long":
+                if self._running["long"] >= self.long_slots:
+                    held.append(item)
+                    continue
+            elif long_waiting and self.slots > self.long_slots:
+                reserve = self.long_slots - self._running["long"]
+                if sum(self._running.values()) >= self.slots - reserve:
+                    held.append(item)
+                    continue
+            self._running[lane] += 1
+            fut.set_result(None)
+            if lane == "long":
+                long_waiting = self._interactive_long(self._waiting + held)
+        for item in held:
+            heapq.heappush(self._waiting, item)
+        self._publish()
+
+    def _release(self, lane):
+        self._running[lane] -= 1
+        self._dispatch()
+
+    async def acquire(self, cost, background=False):
+        # -> lane; background work (tier-2 refinement) is granted after every waiting request
+        lane = self.lane(cost)
+        if not background and sum(1 for w in self._waiting if not w[4].done()) >= self.max_queue:
+            metric_inc("admission_rejected_busy")
+            raise QueueFull("The service is busy right now. Please try again in a minute.")
+        fut = asyncio.get_running_loop().create_future()
+        t0 = time.monotonic()
+        heapq.heappush(self._waiting, (2 if background else int(lane == "long"), cost, next(self._seq), lane, fut, t0))
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():  # granted just as we were cancelled
+                self._release(lane)
+            else:
+                self._publish()
+            raise
+        metric_observe(f"queue_wait_{lane}_s", time.monotonic() - t0)
+        return lane
+
+    async def run(self, cost, ctx, fn, *args, background=False):
+        # -> (lane, fn(*args)) on ANALYSIS_EXECUTOR. The slot is freed when fn returns, not
+        # when the awaiting coroutine does: a cancelled request keeps its thread busy until
+        # its next checkpoint, and that thread still counts against the slot limits
+        lane = await self.acquire(cost, background)
+        fut = asyncio.get_running_loop().run_in_executor(ANALYSIS_EXECUTOR, fn, *args)
+
+        def _done(f):
+            if not f.cancelled():
+                f.exception()  # retrieved here when nobody awaits it any more
+            self._release(lane)
+        fut.add_done_callback(_done)
+        try:
+            return lane, await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            ctx.cancel()
+            raise
+
+ADMISSION = AdmissionScheduler(ANALYSIS_CONCURRENCY, MAX_LONG_JOBS, MAX_QUEUE_DEPTH)
+
+async def analyze_request(upload, yt, fast, full_lyrics, ctx, source_id=None, tiered=False):
+    # the pipeline behind both the UI and the JSON API; every blocking stage runs
+    # on its own executor and the event loop only awaits.
+    # source_id: stable id of an uploaded file (e.g. its digest) for SOURCE_KEYS
+    # tiered: answer with the tier-1 verdict and refine in the background when needed
+    loop = asyncio.get_running_loop()
+    t0 = time.monotonic()
+    job = {"note": None, "cached": False, "refinement": None}
+    if tiered:
+        fast = False  # what tier 2 computes, and what the cache is checked for
+    if yt and yt.strip():
+        info = await loop.run_in_executor(METADATA_EXECUTOR, resolve_youtube_metadata, yt.strip(), fast)
+        job["title"] = info.get("title", "Unknown title")
+        job["channel"] = info.get("uploader", "Unknown channel")
+        source_id, duration = info["id"], info.get("duration")
+        # a stream has no end to price or analyze (and no upload to probe instead)
+        if info.get("is_live") or info.get("live_status") in ("is_live", "is_upcoming") or not duration:
+            raise UnsupportedSource("Live streams and videos without a known length can't be analyzed. Please upload the audio instead.")
+    else:
+        job["title"] = os.path.basename(upload)
+        job["channel"] = "Local upload"
+        duration = None
+
+    hit = cached_source_result(source_id, fast, full_lyrics) if source_id else None
+    if hit is not None:
+        metric_inc("source_cache_hits")
+        job.update(result=hit, cached=True, fast=fast, full_lyrics=full_lyrics)
+        return job
+
+    if duration is None:
+        duration = await loop.run_in_executor(None, probe_duration, upload)
+    check_duration(duration)
+    fast, full_lyrics, cost, job["note"] = plan_admission(duration, fast, full_lyrics)
+    if tiered:
+        # a downgraded request would refine to FAST, which tier 1 already is
+        tiered, tier2_cost, cost = not fast, cost, estimate_cost(duration, True, False)
+    if yt and yt.strip():
+        ctx.check("download")
+        # shield: other requests may be sharing this download
+        try:
+            upload = await asyncio.shield(asyncio.wrap_future(submit_youtube_download(info, fast, ctx)))
+        except (RequestCancelled, DeadlineExceeded):
+            # an abandoned shared download: report this request's own reason, not another waiter's
+            ctx.check("download")
+            raise
+    if tiered:
+        lane, (key, job["result"], store) = await ADMISSION.run(cost, ctx, tier1_path, upload, full_lyrics, ctx)
+    else:
+        lane, (key, job["result"]) = await ADMISSION.run(cost, ctx, analyze_path, upload, fast, full_lyrics, ctx)
+    metric_observe(f"request_{lane}_s", time.monotonic() - t0)
+    job.update(fast=fast, full_lyrics=full_lyrics)
+    if tiered and job["result"].get("tier") == 1:
+        metric_inc("tier1_answers")
+        if job["result"]["tier2_reason"]:
+            job["refinement"] = start_tier2(key, store, full_lyrics, job, tier2_cost, source_id)
+        else:
+            metric_inc("tier2_skipped")
+    elif source_id:
+        SOURCE_KEYS[(source_id, bool(fast), bool(full_lyrics))] = key
+    return job
+
+# tier-2 jobs by id (the ACCURATE cache key, hashed); finished ones are dropped oldest-first
+TIER_JOBS = OrderedDict()
+TIER_JOBS_MAX = 1024
+
+def start_tier2(key, store, full_lyrics, request_job, cost, source_id=None):
+    job_id = hashlib.sha1(key.encode()).hexdigest()[:16]
+    job = TIER_JOBS.get(job_id)
+    if job is not None and job["status"] != "failed":
+        metric_inc("tier2_shared")
+        return job
+    tier1 = request_job["result"]
+    job = {
+        "id": job_id, "status": "queued", "reason": tier1["tier2_reason"],
+        "tier1_verdict": tier1["verdict"], "title": request_job["title"], "channel": request_job["channel"],
+        "full_lyrics": full_lyrics, "result": None, "error": None,
+        "done": asyncio.Event(),
+    }
+    get_audio_store().pin(store[0])  # unpinned when the job ends
+    job["task"] = asyncio.create_task(_run_tier2(job, key, store, cost, source_id))
+    TIER_JOBS[job_id] = job
+    for old in [k for k, j in TIER_JOBS.items() if j["done"].is_set()][: max(0, len(TIER_JOBS) - TIER_JOBS_MAX)]:
+        del TIER_JOBS[old]
+    metric_inc("tier2_started")
+    return job
+
+async def _run_tier2(job, key, store, cost, source_id):
+    t0 = time.monotonic()
+    # no deadline: nobody is waiting on this request, and a degraded result would not be cached
+    ctx = RequestContext(deadline_s=0)
+
+    def work():  # runs once the slot is granted
+        job["status"] = "running"
+        return tier2_analysis(store, job["full_lyrics"], ctx)
+    try:
+        _, (_, result) = await ADMISSION.run(cost, ctx, work, background=True)
+        job.update(status="done", result=result)
+        if source_id:
+            SOURCE_KEYS[(source_id, False, bool(job["full_lyrics"]))] = key
+        metric_inc("tier2_done")
+        if result["verdict"] != job["tier1_verdict"]:
+            metric_inc("tier2_verdict_changed")
+        metric_observe("tier2_s", time.monotonic() - t0)
     except Exception as e:
-        msg = str(e)
-        # YouTube bot-check / auth
-        if ("confirm you’re not a bot" in msg) or ("confirm you're not a bot" in msg) or ("sign in to confirm" in msg):
-            hint = (
-                "YouTube blocked automated downloads for this link.\n\n"
-                "**Fix options:**\n"
-                "1) Use **Upload audio** (works every time), or\n"
-                "2) Try a different YouTube link (some links work, some don’t).\n\n"
-                "This is a YouTube restriction, not your analysis code."
-            )
-            return None, f"❌ Error: {msg}\n\n{hint}\n\n```text\n{traceback.format_exc()}\n```"
-        return None, f"❌ Error: {msg}\n\n```text\n{traceback.format_exc()}\n```"
+        job.update(status="failed", error=str(e))
+        metric_inc("tier2_failed")
     finally:
-        if tmp:
-            shutil.rmtree(tmp, ignore_errors=True)
+        get_audio_store().unpin(store[0])
+        job["done"].set()
+
+def error_output(e):
+    msg = str(e)
+    # YouTube bot-check / auth
+    if ("confirm you’re not a bot" in msg) or ("confirm you're not a bot" in msg) or ("sign in to confirm" in msg):
+        hint = (
+            "YouTube blocked automated downloads for this link.\n\n"
+            "**Fix options:**\n"
+            "1) Use **Upload audio** (works every time), or\n"
+            "2) Try a different YouTube link (some links work, some don’t).\n\n"
+            "This is a YouTube restriction, not your analysis code."
+        )
+        return None, None, f"❌ Error: {msg}\n\n{hint}\n\n```text\n{traceback.format_exc()}\n```"
+    return None, None, f"❌ Error: {msg}\n\n```text\n{traceback.format_exc()}\n```"
+
+async def run(upload, yt, fast, full_lyrics=False, tiered=False):
+    # async generator for the UI: one output, or with tiered the instant verdict and then the refined one.
+    # Gradio cancels this coroutine when the client goes away; ctx tells the threads.
+    if not ((yt and yt.strip()) or upload):
+        yield None, None, "Please upload an audio file OR paste a YouTube link."
+        return
+    loop = asyncio.get_running_loop()
+    ctx = RequestContext()
+    try:
+        job = await analyze_request(upload, yt, fast, full_lyrics, ctx, tiered=tiered)
+        fig, timeline_fig, md = await loop.run_in_executor(None, render_analysis, job["result"], job["title"], job["channel"])
+        if job["note"]:
+            md = f"> ℹ️ {job['note']}\n\n{md}"
+        refinement = job["refinement"]
+        if refinement is None:
+            yield fig, timeline_fig, md
+            return
+
+        yield fig, timeline_fig, f"> ⏳ Instant verdict ({refinement['reason']}); refining with the full ACCURATE analysis…\n\n{md}"
+        try:
+            await asyncio.wait_for(refinement["done"].wait(), timeout=REQUEST_DEADLINE_S or None)
+        except asyncio.TimeoutError:
+            yield fig, timeline_fig, f"> ⏳ Still refining in the background; analyze again later for the refined verdict.\n\n{md}"
+            return
+        if refinement["status"] != "done":
+            yield fig, timeline_fig, f"> ⚠️ Refinement failed ({refinement['error']}); showing the instant verdict.\n\n{md}"
+            return
+        fig, timeline_fig, md = await loop.run_in_executor(None, render_analysis, refinement["result"], job["title"], job["channel"])
+        yield fig, timeline_fig, f"> ✅ Refined with the full ACCURATE analysis (instant verdict was {refinement['tier1_verdict']}).\n\n{md}"
+
+    except (asyncio.CancelledError, RequestCancelled):
+        ctx.cancel()
+        metric_inc("requests_cancelled")
+        raise
+    except DeadlineExceeded as e:
+        # the deadline lapsed before there was any audio to analyze
+        metric_inc("requests_timed_out")
+        yield None, None, f"⏱️ Timed out during {e} after {REQUEST_DEADLINE_S:.0f} s. Please try again or upload the audio file."
+    except (AdmissionRejected, AudioTooLong, UnsupportedSource) as e:
+        yield None, None, f"🚦 {e}"
+    except Exception as e:
+        yield error_output(e)
 
 # ======================================================
-# UI
+# JSON API (same process, executors and caches as the UI)
+# POST /api/analyze  raw audio body, or {"url": ...} as JSON
+#   query: fast, tiered, full_lyrics, timeline, title
+# GET  /api/jobs/{id}?wait=30  tier-2 refinement status / refined result (long poll)
 # ======================================================
 
-with gr.Blocks() as demo:
-    gr.Markdown("# 🎵 Frequency Insight\nUpload audio or paste a YouTube link, then analyze.")
-    up = gr.Audio(type="filepath", label="Upload audio (wav/mp3)")
-    yt = gr.Textbox(label="YouTube link (optional)", placeholder="https://youtube.com/watch?v=...")
-    # Removed fast mode checkbox
+API_MAX_UPLOAD_MB = float(os.getenv("API_MAX_UPLOAD_MB", "200"))
+UPLOAD_DIR = os.path.join(CACHE_DIR, "uploads")
+
+def api_payload(job, include_timeline=False):
+    r = job["result"]
+    out = {
+        "title": job["title"],
+        "channel": job["channel"],
+        "fast_mode": bool(job["fast"]),
+        "full_lyrics": bool(job["full_lyrics"]),
+        "cached": job["cached"],
+        "note": job["note"],
+        "duration": r["duration"],
+        "verdict": r["verdict"],
+        "risk_points": r["risk_points"],
+        "degraded": r["degraded"],
+        "profile": r["profile"],
+        "audio_safety": r["audio_safety"],
+        "scores": r["scores"],
+        "sentiment": r["sentiment"],
+        "lang": r["lang"],
+        "lyrics": r["lyrics"],
+        "lyrics_stats": r["lyrics_stats"],
+        "timeline_flags": r["timeline"]["flags"],
+    }
+    if r.get("tier") == 1:
+        out["tier"] = 1
+    if job["refinement"] is not None:
+        out["refinement"] = refinement_payload(job["refinement"])
+    if include_timeline:
+        out["timeline"] = r["timeline"]
+    return out
+
+def refinement_payload(ref, include_timeline=False):
+    out = {k: ref[k] for k in ("id", "status", "reason", "tier1_verdict", "error")}
+    if ref["status"] == "done":
+        out["result"] = api_payload({
+            "title": ref["title"], "channel": ref["channel"], "fast": False, "full_lyrics": ref["full_lyrics"],
+            "cached": False, "note": None, "refinement": None, "result": ref["result"],
+        }, include_timeline=include_timeline)
+    return out
+
+async def receive_upload(request):
+    # stream the body to disk in chunks (no multipart, no full copy in memory); -> (path, sha1)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    limit = int(API_MAX_UPLOAD_MB * 2**20)
+    h = hashlib.sha1()
+    size = 0
+    fd, path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".upload")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(413, f"Upload exceeds {API_MAX_UPLOAD_MB:g} MB.")
+                h.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    if size == 0:
+        os.remove(path)
+        raise HTTPException(400, "Send audio bytes as the request body, or JSON with a \"url\".")
+    return path, h.hexdigest()
+
+async def cancel_on_disconnect(request, ctx):
+    while not ctx.cancelled:
+        if await request.is_disconnected():
+            ctx.cancel()
+            return
+        await asyncio.sleep(1.0)
+
+def build_api():
+    api = FastAPI(title="Frequency Insight API")
+
+    @api.post("/api/analyze")
+    async def api_analyze(
+        request: Request, fast: bool = False, tiered: bool = False, full_lyrics: bool = False,
+        timeline: bool = False, title: str = "",
+    ):
+        ctx = RequestContext()
+        path = digest = url = None
+        try:
+            if request.headers.get("content-type", "").startswith("application/json"):
+                try:
+                    body = await request.json()
+                except ValueError:
+                    raise HTTPException(400, "Invalid JSON body.")
+                if not isinstance(body, dict):
+                    raise HTTPException(400, "JSON body must be an object.")
+                url = body.get("url") or ""
+                if not isinstance(url, str):
+                    raise HTTPException(400, "\"url\" must be a string.")
+                url = url.strip()
+                for name in ("fast", "tiered", "full_lyrics"):
+                    if not isinstance(body.get(name, False), bool):
+                        raise HTTPException(400, f"\"{name}\" must be true or false.")
+                fast = body.get("fast", fast)
+                tiered = body.get("tiered", tiered)
+                full_lyrics = body.get("full_lyrics", full_lyrics)
+                if not url:
+                    raise HTTPException(400, "JSON body needs a \"url\".")
+            else:
+                path, digest = await receive_upload(request)
+            watcher = asyncio.create_task(cancel_on_disconnect(request, ctx))
+            try:
+                job = await analyze_request(path, url, fast, full_lyrics, ctx, source_id=digest and f"sha1:{digest}", tiered=tiered)
+            finally:
+                watcher.cancel()
+            if path:  # the temp file name means nothing to the caller
+                job["title"], job["channel"] = title or "Uploaded audio", "API upload"
+            metric_inc("api_requests")
+            return JSONResponse(api_payload(job, include_timeline=timeline))
+        except RequestCancelled:
+            metric_inc("requests_cancelled")
+            raise HTTPException(499, "Client closed request.")
+        except DeadlineExceeded as e:
+            metric_inc("requests_timed_out")
+            raise HTTPException(504, f"Timed out during {e}.")
+        except QueueFull as e:
+            raise HTTPException(429, str(e), headers={"Retry-After": "30"})
+        except AdmissionRejected as e:
+            raise HTTPException(413, str(e))
+        except AudioTooLong as e:  # over MAX_DURATION_S
+            raise HTTPException(413, str(e))
+        except (RuntimeError, UnsupportedSource) as e:  # undecodable audio / live stream
+            raise HTTPException(422, str(e))
+        except yt_dlp.utils.DownloadError as e:  # removed/private video, bot check, network
+            raise HTTPException(422, str(e))
+        finally:
+            if path:
+                os.remove(path)
+
+    @api.get("/api/jobs/{job_id}")
+    async def api_job(job_id: str, wait: float = 0.0, timeline: bool = False):
+        job = TIER_JOBS.get(job_id)
+        if job is None:
+            raise HTTPException(404, "Unknown or expired job.")
+        if wait > 0 and not job["done"].is_set():
+            try:
+                await asyncio.wait_for(job["done"].wait(), timeout=min(wait, 60.0))
+            except asyncio.TimeoutError:
+                pass
+        return refinement_payload(job, include_timeline=timeline)
 
-    btn = gr.Button("Analyze")
-    plot = gr.Plot()
-    text = gr.Markdown()
+    @api.get("/api/metrics")
+    def api_metrics():
+        return metrics_snapshot()
 
-    # Changed btn.click to pass False for fast_mode by default
-    btn.click(lambda upload_val, yt_val: run(upload_val, yt_val, False), [up, yt], [plot, text])
+    @api.get("/api/models")
+    def api_models():
+        # this process only; each lyrics worker keeps its own registry under the same budget
+        return MODELS.report()
 
-demo.queue().launch(server_name="0.0.0.0", server_port=int(os.getenv("PORT", "7860")), share=False)
+    @api.get("/api/health")
+    def api_health():
+        return {"ok": True}
+
+    return api
+
+# ======================================================
+# UI
+# ======================================================
+
+def build_ui():
+    with gr.Blocks() as demo:
+        gr.Markdown("# 🎵 Frequency Insight\nUpload audio or paste a YouTube link, then analyze.")
+        up = gr.Audio(type="filepath", label="Upload audio (wav/mp3)")
+        yt = gr.Textbox(label="YouTube link (optional)", placeholder="https://youtube.com/watch?v=...")
+        mode = gr.Radio(
+            ["ACCURATE", "FAST", "TIERED"], value="ACCURATE", label="Analysis mode",
+            info="FAST profiles ~1 minute sampled across the track and transcribes with a smaller Whisper model. "
+                 "TIERED answers from the audio at once and refines with ACCURATE only when lyrics could change the verdict.",
+        )
+        full = gr.Checkbox(label="Full-track lyrics (whole song, slower)", value=False)
+
+        btn = gr.Button("Analyze")
+        plot = gr.Plot()
+        timeline_plot = gr.Plot()
+        text = gr.Markdown()
+
+        async def on_analyze(upload_val, yt_val, mode_val, full_val):
+            async for out in run(upload_val, yt_val, mode_val == "FAST", full_val, tiered=mode_val == "TIERED"):
+                yield out
+
+        # run() caps downloads and schedules analyses itself, so Gradio need not serialize
+        btn.click(on_analyze, [up, yt, mode, full], [plot, timeline_plot, text], concurrency_limit=None)
+
+        with gr.Accordion("Service metrics", open=False):
+            stats = gr.JSON()
+            refresh = gr.Button("Refresh")
+        refresh.click(metrics_snapshot, None, stats)
+    return demo
+
+# guarded so lyrics worker processes (spawn) can import this module without launching
+if __name__ == "__main__":
+    # the UI is mounted on the API's FastAPI app: one server, one set of pools and caches
+    preload_models()
+    server = gr.mount_gradio_app(build_api(), build_ui().queue(), path="/")
+    uvicorn.run(
+        server, host="0.0.0.0", port=int(os.getenv("PORT", "7860")),
+        timeout_keep_alive=int(os.getenv("KEEPALIVE_S", "30")),
+    )
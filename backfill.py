@@ -0,0 +1,105 @@
+# Catalog backfill: FAST-excerpt band profile + audio safety for many files at once.
+#   python backfill.py catalog/ more/*.mp3 --out scores.jsonl [--workers 8] [--batch 8] [--sr 44100]
+# Files are sharded across worker processes; each worker decodes only the FAST excerpt
+# windows and scores a whole batch with app.batch_audio_safety. Lyrics are not part of
+# a backfill: the verdict written here is the audio-only one.
+
+import argparse, glob, json, multiprocessing, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+AUDIO_EXT = (".mp3", ".wav", ".flac", ".ogg", ".m4a", ".opus", ".webm", ".aac")
+
+
+def catalog(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(f for f in glob.glob(os.path.join(p, "**", "*"), recursive=True) if f.lower().endswith(AUDIO_EXT))
+        else:
+            files.append(p)
+    return files
+
+
+def audio_verdict(safety):
+    import app
+    if safety["hard_not"] or safety["points"] >= app.RISK_NOT:
+        return "NOT RECOMMENDED"
+    if safety["points"] >= app.RISK_MODERATION:
+        return "USE WITH MODERATION"
+    return "RECOMMENDED"
+
+
+def score_shard(paths, sr):
+    # runs in a worker: decode excerpts, stack the equal-length ones, score per batch
+    import numpy as np
+    import app
+
+    t0 = time.perf_counter()
+    rows, excerpts = [], []
+    for path in paths:
+        try:
+            y, duration = app.decode_excerpts(path, sr)
+            excerpts.append((path, duration, y))
+        except Exception as e:
+            rows.append({"file": path, "error": str(e)})
+    t_decode = time.perf_counter() - t0
+
+    # full-length excerpts share one batch; short tracks (whole track < excerpt) go one by one
+    by_len = {}
+    for item in excerpts:
+        by_len.setdefault(len(item[2]), []).append(item)
+    for group in by_len.values():
+        scored = app.batch_audio_safety(np.stack([y for _, _, y in group]), sr)
+        for (path, duration, _), (profile, safety) in zip(group, scored):
+            rows.append({
+                "file": path, "duration": duration, "verdict_audio": audio_verdict(safety),
+                "profile": profile, "audio_safety": safety,
+            })
+    return rows, t_decode, time.perf_counter() - t0 - t_decode
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch DSP rescoring of an audio catalog")
+    parser.add_argument("paths", nargs="+", help="audio files or directories")
+    parser.add_argument("--out", required=True, help="JSON lines, one per file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch", type=int, default=8, help="files per shard (rows per STFT batch)")
+    parser.add_argument("--sr", type=int, default=44100, help="decode rate; one rate for the whole catalog so excerpts stack")
+    args = parser.parse_args()
+
+    files = catalog(args.paths)
+    if not files:
+        sys.exit("no audio files found")
+    shards = [files[i:i + args.batch] for i in range(0, len(files), args.batch)]
+
+    # one process per core, so each keeps its FFTs single-threaded
+    os.environ.setdefault("FFT_WORKERS", "1")
+    ctx = multiprocessing.get_context("spawn")
+    done = errors = 0
+    t_decode = t_dsp = 0.0
+    t0 = time.perf_counter()
+    with open(args.out, "w") as out, ProcessPoolExecutor(args.workers, mp_context=ctx) as pool:
+        futs = [pool.submit(score_shard, shard, args.sr) for shard in shards]
+        for fut in as_completed(futs):
+            rows, td, tp = fut.result()
+            t_decode += td
+            t_dsp += tp
+            for row in rows:
+                out.write(json.dumps(row) + "\n")
+                done += 1
+                errors += "error" in row
+            elapsed = time.perf_counter() - t0
+            print(f"\r{done}/{len(files)} files  {done / elapsed:.1f} tracks/s", end="", flush=True)
+    elapsed = time.perf_counter() - t0
+
+    scored = done - errors
+    print(f"\n{scored} scored, {errors} failed, {elapsed:.1f} s wall, {args.workers} workers")
+    print(f"  throughput   {scored / elapsed:.2f} tracks/s   {scored / elapsed / args.workers:.2f} tracks/s/core")
+    busy = t_decode + t_dsp
+    if busy:
+        print(f"  worker time  decode {100 * t_decode / busy:.0f} %   dsp {100 * t_dsp / busy:.0f} %"
+              f"   ({scored / busy:.2f} tracks per busy core-second)")
+
+
+if __name__ == "__main__":
+    main()
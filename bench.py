@@ -0,0 +1,324 @@
+# Micro-benchmarks for the DSP hot paths in app.py.
+#   python bench.py bands [--seconds 180] [--sr 44100] [--repeat 20]
+#   python bench.py dsp [--file track.mp3 | --seconds 1800] [--sr 44100]
+#   python bench.py batch [--tracks 32] [--batch 8] [--sr 44100]
+#   python bench.py fingerprint [--index 300000] [--tracks 200] [--db fingerprints.sqlite3]
+
+import argparse, os, shutil, subprocess, tempfile, timeit, time, tracemalloc
+import numpy as np
+
+import app
+
+
+def legacy_band_energy(fft, freqs):
+    # the per-band np.where loop aggregate_bands replaced
+    out = {}
+    for b, (lo, hi) in app.BANDS.items():
+        idx = np.where((freqs >= lo) & (freqs < hi))[0]
+        out[b] = float(np.sum(fft[idx]))
+    out["infra"] = float(np.sum(fft[freqs < app.INFRA_HZ]))
+    out["ultra"] = float(np.sum(fft[freqs > app.ULTRA_HZ]))
+    return out
+
+
+def best_ms(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def bench_bands(args):
+    rng = np.random.default_rng(0)
+    sr = args.sr
+    y = rng.standard_normal(int(args.seconds * sr)).astype(np.float32)
+
+    # 1-D: whole-track spectrum (as in compute_analysis / compute_audio_safety)
+    fft = np.abs(np.fft.rfft(y))
+    n = len(y)
+    legacy = lambda: legacy_band_energy(fft, np.fft.rfftfreq(n, 1/sr))
+    new = lambda: app.aggregate_bands(fft, n, sr)
+    ref, got = legacy(), new()
+    err = max(abs(got[k] - ref[k]) / max(abs(ref[k]), 1e-12) for k in ref)
+    print(f"1-D spectrum ({len(fft):,} bins)")
+    print(f"  np.where loop     {best_ms(legacy, args.repeat):8.2f} ms")
+    print(f"  aggregate_bands   {best_ms(new, args.repeat):8.2f} ms   max rel err {err:.1e}")
+
+    # 2-D: STFT magnitudes (as in band_timeline)
+    n_fft, hop = app.TIMELINE_N_FFT, app.TIMELINE_HOP
+    S = np.abs(app.librosa.stft(y[: 60 * sr], n_fft=n_fft, hop_length=hop, center=False))
+    freqs = np.fft.rfftfreq(n_fft, 1/sr)
+    legacy2 = lambda: {b: S[(freqs >= lo) & (freqs < hi)].sum(axis=0) for b, (lo, hi) in app.BANDS.items()}
+    new2 = lambda: app.aggregate_bands(S, n_fft, sr, axis=0)
+    ref2, got2 = legacy2(), new2()
+    err2 = max(float(np.max(np.abs(got2[b] - ref2[b]) / np.maximum(np.abs(ref2[b]), 1e-12))) for b in app.BANDS)
+    print(f"2-D spectrogram {S.shape[0]} x {S.shape[1]} frames")
+    print(f"  boolean masks     {best_ms(legacy2, args.repeat):8.2f} ms")
+    print(f"  aggregate_bands   {best_ms(new2, args.repeat):8.2f} ms   max rel err {err2:.1e}")
+
+
+def synthetic_track(seconds, sr, seed=0):
+    # harmonic tones + noise bursts: enough spectral structure for the features to mean something
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    t = np.arange(n, dtype=np.float32) / sr
+    y = np.zeros(n, dtype=np.float32)
+    for f0 in (110.0, 220.0, 440.0, 1320.0, 5000.0):
+        y += (0.2 / np.sqrt(f0 / 110.0)) * np.sin(2 * np.pi * f0 * t, dtype=np.float32)
+    y += 0.02 * rng.standard_normal(n).astype(np.float32)
+    return y
+
+
+def legacy_float64(y, sr):
+    # the float64 path as it was: np.fft on float64, one librosa STFT per feature
+    y = y.astype(np.float64)
+    fft = np.abs(np.fft.rfft(y))
+    freqs = np.fft.rfftfreq(len(y), 1/sr)
+    band = {b: float(np.sum(fft[(freqs >= lo) & (freqs < hi)])) for b, (lo, hi) in app.BANDS.items()}
+    total_b = sum(band.values()) or 1.0
+    total = float(np.sum(fft) + 1e-12)
+    hop, n_fft = 512, 2048
+    q = lambda x: float(np.quantile(x, 0.5))
+    metrics = {
+        "rms_db": float(20 * np.log10(np.sqrt(np.mean(y**2)) + 1e-12)),
+        "centroid_med": q(app.librosa.feature.spectral_centroid(y=y, sr=sr, n_fft=n_fft, hop_length=hop)[0]),
+        "rolloff_p95": float(np.quantile(app.librosa.feature.spectral_rolloff(y=y, sr=sr, n_fft=n_fft, hop_length=hop, roll_percent=0.85)[0], 0.95)),
+        "flatness_med": q(app.librosa.feature.spectral_flatness(y=y, n_fft=n_fft, hop_length=hop)[0]),
+        "crest": float((np.max(fft) + 1e-12) / (np.mean(fft) + 1e-12)),
+        "infra_ratio": float(np.sum(fft[freqs < 20]) / total),
+        "ultra_ratio": float(np.sum(fft[freqs > 18000]) / total),
+    }
+    return {b: v / total_b for b, v in band.items()}, metrics
+
+
+def float32_path(y, sr):
+    fft = app.magnitude_spectrum(y)
+    bands = app.aggregate_bands(fft, len(y), sr)
+    total_b = sum(bands[b] for b in app.BANDS) or 1.0
+    safety = app.compute_audio_safety(y, sr, False, fft=fft, bands=bands)
+    return {b: bands[b] / total_b for b in app.BANDS}, safety["metrics"]
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, elapsed, peak / 2**20
+
+
+def bench_dsp(args):
+    if args.file:
+        y, sr = app.decode_audio(args.file, sr=args.sr)
+        y = np.array(y)
+    else:
+        sr = args.sr
+        y = synthetic_track(args.seconds, sr)
+    print(f"{len(y)/sr:.0f} s of audio at {sr} Hz (FFT_WORKERS={app.FFT_WORKERS})")
+
+    (p64, m64), t64, mem64 = measure(legacy_float64, y, sr)
+    (p32, m32), t32, mem32 = measure(float32_path, y, sr)
+    print(f"  float64 legacy   {t64:7.2f} s   peak {mem64:8.1f} MiB")
+    print(f"  float32 path     {t32:7.2f} s   peak {mem32:8.1f} MiB")
+
+    ok = True
+    prof_err = max(abs(p32[b] - p64[b]) for b in app.BANDS)
+    print(f"  profile max abs diff  {prof_err:.2e}  (tol {args.profile_tol:g})")
+    ok &= prof_err <= args.profile_tol
+    for k, ref in m64.items():
+        rel = abs(m32[k] - ref) / max(abs(ref), 1e-9)
+        flag = "" if rel <= args.metric_tol else "   <-- out of tolerance"
+        ok &= rel <= args.metric_tol
+        print(f"  {k:<14} {ref:14.6g} {m32[k]:14.6g}   rel {rel:.1e}{flag}")
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def per_track_fast(excerpt, sr):
+    # what compute_analysis(fast_mode=True) does for profile + safety, one track at a time
+    fft = app.magnitude_spectrum(excerpt)
+    bands = app.aggregate_bands(fft, len(excerpt), sr)
+    total_b = sum(bands[b] for b in app.BANDS) or 1.0
+    safety = app.compute_audio_safety(excerpt, sr, False, fft=fft, bands=bands)
+    return {b: bands[b] / total_b for b in app.BANDS}, safety
+
+
+def bench_batch(args):
+    sr = args.sr
+    n = app.FAST_WINDOWS * int(app.FAST_WINDOW_S * sr)
+    # distinct synthetic tracks, already cut to FAST excerpt length
+    X = np.stack([synthetic_track(n / sr, sr, seed=i) * (0.5 + (i % 5) / 5) for i in range(args.tracks)])
+    print(f"{args.tracks} excerpts of {n / sr:.0f} s at {sr} Hz, batches of {args.batch} (FFT_WORKERS={app.FFT_WORKERS})")
+
+    t0 = time.perf_counter()
+    ref = [per_track_fast(x, sr) for x in X]
+    t_loop = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = [r for i in range(0, len(X), args.batch) for r in app.batch_audio_safety(X[i:i + args.batch], sr)]
+    t_batch = time.perf_counter() - t0
+    print(f"  per-track loop   {t_loop:7.2f} s   {len(X) / t_loop:6.1f} tracks/s")
+    print(f"  batched          {t_batch:7.2f} s   {len(X) / t_batch:6.1f} tracks/s")
+
+    prof_err = max(abs(g[0][b] - r[0][b]) for g, r in zip(got, ref) for b in app.BANDS)
+    metric_err = max(
+        abs(g[1]["metrics"][k] - v) / max(abs(v), 1e-9) for g, r in zip(got, ref) for k, v in r[1]["metrics"].items()
+    )
+    same = sum(
+        (g[1]["points"], g[1]["hard_not"], g[1]["sound_type"]) == (r[1]["points"], r[1]["hard_not"], r[1]["sound_type"])
+        for g, r in zip(got, ref)
+    )
+    print(f"  profile max abs diff {prof_err:.1e}   metric max rel diff {metric_err:.1e}   same scoring {same}/{len(X)}")
+    ok = same == len(X) and prof_err <= 1e-4 and metric_err <= 1e-3
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def song_like_track(seconds, sr, seed):
+    # chord changes, note envelopes and noise hits: prints that differ from track to track
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    t = np.arange(n, dtype=np.float32) / sr
+    y = np.zeros(n, dtype=np.float32)
+    edges = np.sort(rng.integers(0, n, size=int(seconds / 2)))
+    for a, b in zip(np.r_[0, edges], np.r_[edges, n]):
+        for f0 in 55.0 * 2 ** (rng.integers(12, 60, size=3) / 12):
+            env = np.exp(-np.arange(b - a, dtype=np.float32) / (sr * rng.uniform(0.2, 2.0)))
+            y[a:b] += rng.uniform(0.05, 0.3) * env * np.sin(2 * np.pi * f0 * t[a:b], dtype=np.float32)
+    for hit in rng.integers(0, n - sr // 10, size=int(seconds * rng.uniform(0.5, 3))):
+        y[hit:hit + sr // 10] += rng.uniform(0.05, 0.4) * rng.standard_normal(sr // 10).astype(np.float32)
+    return y
+
+def ffmpeg_roundtrip(y, sr, codec_args):
+    # encode to a lossy format and decode back, as a re-upload would be
+    with tempfile.TemporaryDirectory() as d:
+        src, enc = os.path.join(d, "in.f32"), os.path.join(d, "enc" + codec_args[-1])
+        y.astype(np.float32).tofile(src)
+        raw = ["ffmpeg", "-nostdin", "-v", "error", "-y"]
+        subprocess.run(raw + ["-f", "f32le", "-ar", str(sr), "-ac", "1", "-i", src, *codec_args[:-1], enc], check=True)
+        out = subprocess.run(raw + ["-i", enc, "-f", "f32le", "-ac", "1", "-ar", str(sr), "-"], check=True, capture_output=True).stdout
+    return np.frombuffer(out, dtype=np.float32)
+
+def with_noise(y, snr_db, rng):
+    noise = rng.standard_normal(len(y)).astype(np.float32)
+    return y + noise * np.sqrt(np.mean(y**2) / 10 ** (snr_db / 10)).astype(np.float32)
+
+def lowpass(y, sr, hz):
+    sos = app.scipy.signal.butter(8, hz, fs=sr, output="sos")
+    return app.scipy.signal.sosfilt(sos, y).astype(np.float32)
+
+def bench_fingerprint(args):
+    sr = args.sr
+    rng = np.random.default_rng(0)
+    tracks = [song_like_track(args.seconds, sr, seed) for seed in range(args.tracks)]
+    prints = [app.perceptual_fingerprint(y, sr) for y in tracks]
+
+    # robustness: bit flips per degradation vs FP_MAX_HAMMING
+    degradations = {
+        "gain -6 dB": lambda y: y * 0.5,
+        "resample 22.05k and back": lambda y: app.resample_poly_f32(app.resample_poly_f32(y, sr, 22050), 22050, sr),
+        "low-pass 11 kHz": lambda y: lowpass(y, sr, 11000),
+        "16-bit quantize": lambda y: np.round(y * 32767) / 32767,
+        "20 ms lead-in": lambda y: np.r_[np.zeros(sr // 50, np.float32), y],
+        "noise 40 dB SNR": lambda y: with_noise(y, 40, rng),
+        "noise 30 dB SNR": lambda y: with_noise(y, 30, rng),
+        "noise 25 dB SNR": lambda y: with_noise(y, 25, rng),
+    }
+    if shutil.which("ffmpeg"):
+        degradations["mp3 128k"] = lambda y: ffmpeg_roundtrip(y, sr, ["-c:a", "libmp3lame", "-b:a", "128k", ".mp3"])
+        degradations["mp3 64k"] = lambda y: ffmpeg_roundtrip(y, sr, ["-c:a", "libmp3lame", "-b:a", "64k", ".mp3"])
+        degradations["aac 96k"] = lambda y: ffmpeg_roundtrip(y, sr, ["-c:a", "aac", "-b:a", "96k", ".m4a"])
+    else:
+        print("ffmpeg not found: lossy codec round trips skipped")
+    print(f"bit flips over {args.tracks} tracks of {args.seconds:.0f} s (match if <= {app.FP_MAX_HAMMING})")
+    robust = True
+    for name, fn in degradations.items():
+        flips = np.array([(app.perceptual_fingerprint(fn(y), sr) ^ fp).bit_count() for y, fp in zip(tracks, prints)])
+        within = 100.0 * np.mean(flips <= app.FP_MAX_HAMMING)
+        print(f"  {name:<26} p50 {np.median(flips):4.0f}   p95 {np.percentile(flips, 95):4.0f}   max {flips.max():3d}   matched {within:5.1f} %")
+        robust &= within >= args.min_match_pct or "noise" in name
+
+    # distinct tracks must not match each other
+    false = sum((a ^ b).bit_count() <= app.FP_MAX_HAMMING for i, a in enumerate(prints) for b in prints[i + 1:])
+    print(f"  distinct track pairs within {app.FP_MAX_HAMMING} bits: {false} of {len(prints) * (len(prints) - 1) // 2}")
+
+    # lookup: index of real prints (--db) or synthetic ones: "skewed" draws bits independently
+    # with the measured per-bit rates; "clustered" perturbs the measured prints by 4-12 bits,
+    # so prints share 16-bit parts and buckets crowd the way similar-sounding tracks would
+    if args.db:
+        import sqlite3
+        with sqlite3.connect(args.db) as db:
+            corpus = [int(fp, 16) for (fp,) in db.execute("SELECT fp FROM fingerprints")]
+        print(f"index of {len(corpus):,} prints from {args.db}")
+    elif args.corpus == "clustered":
+        flips = [rng.choice(64, size=rng.integers(4, 13), replace=False) for _ in range(args.index)]
+        corpus = [prints[i % len(prints)] ^ sum(1 << int(b) for b in f) for i, f in enumerate(flips)]
+        print(f"index of {len(corpus):,} prints clustered around {len(prints)} tracks")
+    else:
+        bits = np.array([[(fp >> k) & 1 for k in range(64)] for fp in prints], dtype=float)
+        p = bits.mean(axis=0)
+        draws = (rng.random((args.index, 64)) < p).astype(np.uint64)
+        corpus = [int(v) for v in (draws << np.arange(64, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)]
+        print(f"index of {len(corpus):,} synthetic prints (per-bit one-rate {p.min():.2f}..{p.max():.2f})")
+    idx = app.FingerprintIndex(os.path.join(tempfile.mkdtemp(prefix="fi-bench-"), "fp.sqlite3"))
+    t0 = time.perf_counter()
+    for i, fp in enumerate(corpus):
+        idx._insert(f"k{i}", fp, 180.0)
+    print(f"  build {time.perf_counter() - t0:.1f} s")
+    buckets = np.array([len(keys) for table in idx._tables for keys, _, _ in table.values()])
+    print(f"  bucket size   mean {buckets.mean():.1f}   p99 {np.percentile(buckets, 99):.0f}   max {buckets.max()}")
+
+    probes = [corpus[i] ^ (1 << int(rng.integers(64))) for i in rng.integers(0, len(corpus), args.probes // 2)]
+    probes += [int(v) for v in rng.integers(0, 2**63, args.probes // 2, dtype=np.int64)]  # mostly misses
+    times = []
+    for fp in probes:
+        t0 = time.perf_counter()
+        idx.lookup(fp, 180.0)
+        times.append(time.perf_counter() - t0)
+    ms = np.array(times) * 1000
+    print(f"  lookup ms     p50 {np.median(ms):.3f}   p99 {np.percentile(ms, 99):.3f}   max {ms.max():.3f}")
+    ok = robust and np.percentile(ms, 99) < args.max_lookup_ms
+    print("PASS" if ok else "FAIL")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="DSP micro-benchmarks for app.py")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("bands", help="band aggregation: np.where loop vs aggregate_bands")
+    p.add_argument("--seconds", type=float, default=180.0)
+    p.add_argument("--sr", type=int, default=44100)
+    p.add_argument("--repeat", type=int, default=20)
+    p.set_defaults(fn=bench_bands)
+
+    p = sub.add_parser("dsp", help="float32 DSP path vs the float64 one: parity, time, peak memory")
+    p.add_argument("--file", help="audio file to decode (default: synthetic track)")
+    p.add_argument("--seconds", type=float, default=1800.0)
+    p.add_argument("--sr", type=int, default=44100)
+    p.add_argument("--profile-tol", type=float, default=1e-4)
+    p.add_argument("--metric-tol", type=float, default=1e-3)
+    p.set_defaults(fn=bench_dsp)
+
+    p = sub.add_parser("batch", help="batch_audio_safety vs the per-track FAST path: parity and tracks/s")
+    p.add_argument("--tracks", type=int, default=32)
+    p.add_argument("--batch", type=int, default=8)
+    p.add_argument("--sr", type=int, default=44100)
+    p.set_defaults(fn=bench_batch)
+
+    p = sub.add_parser("fingerprint", help="perceptual fingerprint: bit flips under re-encoding, index lookup time")
+    p.add_argument("--tracks", type=int, default=200)
+    p.add_argument("--seconds", type=float, default=60.0)
+    p.add_argument("--sr", type=int, default=44100)
+    p.add_argument("--index", type=int, default=300000, help="synthetic index size")
+    p.add_argument("--corpus", choices=["skewed", "clustered"], default="clustered", help="synthetic index model")
+    p.add_argument("--db", help="use the prints of a fingerprints.sqlite3 instead")
+    p.add_argument("--probes", type=int, default=2000)
+    p.add_argument("--max-lookup-ms", type=float, default=1.0, help="p99 target")
+    p.add_argument("--min-match-pct", type=float, default=95.0, help="per codec/resample degradation")
+    p.set_defaults(fn=bench_fingerprint)
+
+    args = parser.parse_args()
+    if args.fn(args) is False:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
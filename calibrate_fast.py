@@ -0,0 +1,131 @@
+# Calibration report: FAST vs ACCURATE on a corpus of audio files.
+#   python calibrate_fast.py music/ more/*.mp3 [--full-lyrics] [--limit 50] [--json report.json]
+# Each track is decoded once and analysed in both modes (fresh caches, models warmed first),
+# so the timings compare the analysis itself, not downloads or model loading.
+
+import argparse, glob, json, os, sys, tempfile, time
+from collections import Counter
+
+# fresh transcript/PCM caches unless told otherwise: cached segments would flatter both modes
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="fi-calibrate-"))
+
+import numpy as np
+import app
+
+AUDIO_EXT = (".mp3", ".wav", ".flac", ".ogg", ".m4a", ".opus", ".webm", ".aac")
+
+
+def corpus(paths, limit):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(f for f in glob.glob(os.path.join(p, "**", "*"), recursive=True) if f.lower().endswith(AUDIO_EXT))
+        else:
+            files.append(p)
+    return files[:limit] if limit else files
+
+
+def timed(y, sr, fast, full_lyrics, store_key, y16):
+    t0 = time.perf_counter()
+    r = app.compute_analysis(y, sr, fast, full_lyrics=full_lyrics, store_key=store_key, y16=y16)
+    return r, time.perf_counter() - t0
+
+
+def compare(path, full_lyrics):
+    y, sr, key = app.get_audio_store().decode(path)
+    y16 = app.asr_copy(y, sr, key)
+    acc, t_acc = timed(y, sr, False, full_lyrics, key, y16)
+    fast, t_fast = timed(y, sr, True, full_lyrics, key, y16)
+    diff = {b: fast["profile"][b] - acc["profile"][b] for b in app.BANDS}
+    return {
+        "file": path,
+        "duration": acc["duration"],
+        "verdict_accurate": acc["verdict"],
+        "verdict_fast": fast["verdict"],
+        "verdict_match": acc["verdict"] == fast["verdict"],
+        "dominant_match": max(acc["profile"], key=acc["profile"].get) == max(fast["profile"], key=fast["profile"].get),
+        "profile_max_diff": max(abs(d) for d in diff.values()),
+        "profile_l1": sum(abs(d) for d in diff.values()),
+        "profile_diff": diff,
+        "hard_not_match": acc["audio_safety"]["hard_not"] == fast["audio_safety"]["hard_not"],
+        "risk_points_accurate": acc["risk_points"],
+        "risk_points_fast": fast["risk_points"],
+        "seconds_accurate": t_acc,
+        "seconds_fast": t_fast,
+    }
+
+
+def summarize(rows):
+    n = len(rows)
+    pct = lambda k: 100.0 * sum(r[k] for r in rows) / n
+    maxd = np.array([r["profile_max_diff"] for r in rows]) * 100
+    speed = np.array([r["seconds_accurate"] / max(r["seconds_fast"], 1e-9) for r in rows])
+    per_band = {b: float(np.percentile([abs(r["profile_diff"][b]) * 100 for r in rows], 95)) for b in app.BANDS}
+    return {
+        "tracks": n,
+        "audio_hours": sum(r["duration"] for r in rows) / 3600,
+        "verdict_agreement_pct": pct("verdict_match"),
+        "dominant_band_agreement_pct": pct("dominant_match"),
+        "hard_not_agreement_pct": pct("hard_not_match"),
+        "profile_max_diff_pp": {"p50": float(np.percentile(maxd, 50)), "p95": float(np.percentile(maxd, 95)), "max": float(maxd.max())},
+        "profile_band_diff_p95_pp": per_band,
+        "confusion": {f"{a} -> {f}": c for (a, f), c in sorted(Counter((r["verdict_accurate"], r["verdict_fast"]) for r in rows).items())},
+        "speedup": {
+            "aggregate": sum(r["seconds_accurate"] for r in rows) / max(sum(r["seconds_fast"] for r in rows), 1e-9),
+            "p50": float(np.percentile(speed, 50)),
+            "min": float(speed.min()),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="How often FAST agrees with ACCURATE, and how much faster it is")
+    parser.add_argument("paths", nargs="+", help="audio files or directories")
+    parser.add_argument("--full-lyrics", action="store_true", help="compare full-track lyrics runs")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--json", help="write per-track rows and the summary here")
+    args = parser.parse_args()
+
+    files = corpus(args.paths, args.limit)
+    if not files:
+        sys.exit("no audio files found")
+
+    # model loading is a one-off per process; keep it out of the timings
+    app.get_whisper("base"), app.get_whisper("tiny"), app.get_sentiment()
+
+    rows = []
+    for i, path in enumerate(files, 1):
+        try:
+            row = compare(path, args.full_lyrics)
+        except Exception as e:
+            print(f"[{i}/{len(files)}] skip {path}: {e}")
+            continue
+        rows.append(row)
+        mark = "" if row["verdict_match"] else "   <-- verdict differs"
+        print(
+            f"[{i}/{len(files)}] {os.path.basename(path)[:40]:<40} {row['verdict_accurate']:<20} {row['verdict_fast']:<20} "
+            f"Δprofile {row['profile_max_diff']*100:5.2f} pp  x{row['seconds_accurate']/max(row['seconds_fast'], 1e-9):4.1f}{mark}"
+        )
+    if not rows:
+        sys.exit("no track could be analysed")
+
+    s = summarize(rows)
+    print(f"\n{s['tracks']} tracks, {s['audio_hours']:.1f} h of audio")
+    print(f"  verdict agreement        {s['verdict_agreement_pct']:6.1f} %")
+    print(f"  dominant band agreement  {s['dominant_band_agreement_pct']:6.1f} %")
+    print(f"  hard-NOT agreement       {s['hard_not_agreement_pct']:6.1f} %")
+    d = s["profile_max_diff_pp"]
+    print(f"  profile max |Δ| (pp)     p50 {d['p50']:.2f}   p95 {d['p95']:.2f}   max {d['max']:.2f}")
+    print("  per-band p95 |Δ| (pp)    " + "  ".join(f"{b} {v:.2f}" for b, v in s["profile_band_diff_p95_pp"].items()))
+    for k, c in s["confusion"].items():
+        print(f"    {k:<45} {c}")
+    sp = s["speedup"]
+    print(f"  speedup                  x{sp['aggregate']:.2f} overall   p50 x{sp['p50']:.2f}   min x{sp['min']:.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": s, "tracks": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Load test for the JSON API (stdlib only; one keep-alive connection per client thread).
+#   python loadtest.py --file corpus/ more/*.mp3 [--host http://localhost:7860] [--clients 8] [--requests 200] [--fast]
+#   python loadtest.py --url "https://youtube.com/watch?v=..." --url "..." --clients 4 --requests 40
+# Requests cycle through the given sources. A source seen before is answered from the
+# server's cache, so cached and analysed responses are reported separately; pass at
+# least --requests distinct files to measure analysis only.
+
+import argparse, glob, http.client, itertools, json, os, sys, threading, time, urllib.parse
+from collections import Counter
+import numpy as np
+
+AUDIO_EXT = (".mp3", ".wav", ".flac", ".ogg", ".m4a", ".opus", ".webm", ".aac")
+
+
+def sources(args):
+    # -> [(body bytes or path, headers)]; files are read when sent, not all held in memory
+    if args.url:
+        return [(json.dumps({"url": u}).encode(), {"Content-Type": "application/json"}) for u in args.url]
+    files = []
+    for p in args.file:
+        if os.path.isdir(p):
+            files += sorted(f for f in glob.glob(os.path.join(p, "**", "*"), recursive=True) if f.lower().endswith(AUDIO_EXT))
+        else:
+            files.append(p)
+    return [(f, {"Content-Type": "application/octet-stream"}) for f in files]
+
+
+def client(args, path, jobs, results, lock):
+    u = urllib.parse.urlsplit(args.host)
+    conn_cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(u.hostname, u.port, timeout=args.timeout)
+    while True:
+        with lock:
+            job = next(jobs, None)
+        if job is None:
+            break
+        body, headers = job
+        if isinstance(body, str):
+            with open(body, "rb") as f:
+                body = f.read()
+        cached = None
+        t0 = time.perf_counter()
+        try:
+            conn.request("POST", path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            status = resp.status
+            if status == 200:
+                cached = bool(json.loads(data).get("cached"))
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            status = type(e).__name__
+            conn.close()  # reconnect on the next request
+        with lock:
+            results.append((time.perf_counter() - t0, status, cached))
+    conn.close()
+
+
+def summary(label, lat):
+    if not len(lat):
+        return f"  {label:<10} 0"
+    lat = np.array(lat) * 1000
+    return (f"  {label:<10} {len(lat):5d}   latency ms p50 {np.percentile(lat, 50):.0f}   "
+            f"p95 {np.percentile(lat, 95):.0f}   max {lat.max():.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test POST /api/analyze")
+    parser.add_argument("--host", default="http://localhost:7860")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--file", nargs="+", help="audio files or directories, sent as raw request bodies")
+    src.add_argument("--url", action="append", help="YouTube link sent as JSON (repeatable)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="total requests across all clients")
+    parser.add_argument("--fast", action="store_true")
+    parser.add_argument("--full-lyrics", action="store_true")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    srcs = sources(args)
+    if not srcs:
+        sys.exit("no audio files found")
+    if len(srcs) < args.requests:
+        print(f"note: {len(srcs)} distinct sources for {args.requests} requests; repeats are served from cache")
+
+    query = urllib.parse.urlencode({"fast": str(args.fast).lower(), "full_lyrics": str(args.full_lyrics).lower()})
+    path = f"{urllib.parse.urlsplit(args.host).path.rstrip('/')}/api/analyze?{query}"
+    jobs = itertools.islice(itertools.cycle(srcs), args.requests)
+    results, lock = [], threading.Lock()
+    threads = [threading.Thread(target=client, args=(args, path, jobs, results, lock)) for _ in range(min(args.clients, args.requests))]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    statuses = Counter(status for _, status, _ in results)
+    analysed = [t for t, _, cached in results if cached is False]
+    cached = [t for t, _, c in results if c]
+    print(f"{len(results)} requests ({len(srcs)} distinct sources), {len(threads)} clients, {elapsed:.1f} s")
+    print(f"  throughput {len(results) / elapsed:8.2f} req/s overall   {len(analysed) / elapsed:.2f} analysed/s")
+    print(summary("analysed", analysed))
+    print(summary("cached", cached))
+    print(summary("failed", [t for t, status, _ in results if status != 200]))
+    print("  status     " + "  ".join(f"{k}: {v}" for k, v in sorted(statuses.items(), key=str)))
+
+
+if __name__ == "__main__":
+    main()